@@ -0,0 +1,92 @@
+# bench_contention.py
+# 并发分配竞争测试：比较单把全局锁（1 个 arena）与按线程数切分 arena 时的总吞吐量，
+# 并统计跨 arena 借用、arena 内紧凑和分配失败的次数，确认负载确实让各自的 arena 溢出。
+# 用法：python bench_contention.py [每线程操作数]
+# 注意：在带 GIL 的 CPython 上纯 Python 代码无法真正并行，吞吐量随线程数的提升
+# 主要体现在 python3.13t 等自由线程构建中；GIL 下本测试反映的是锁竞争开销。
+
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from concurrent_memory import ConcurrentMemoryManager
+
+THREAD_COUNTS = [1, 2, 4, 8]
+TOTAL_SIZE = 400
+MAX_JOB_SIZE = 16
+# 每个线程常驻内存占其 arena 份额（TOTAL_SIZE / 线程数）的比例：偶数号线程超出份额、奇数号线程
+# 用不满，重的线程必须从邻居 arena 借用并触发紧凑，否则测出来的只是互不相干的小 arena
+HEAVY_LOAD = 1.3
+LIGHT_LOAD = 0.5
+SINGLE_LOAD = 0.9  # 只有一个线程时没有邻居可借，取两者平均
+
+
+def live_limit(thread_id, threads):
+    """线程同时持有的作业数，按平均作业大小换算"""
+    if threads == 1:
+        load = SINGLE_LOAD
+    else:
+        load = HEAVY_LOAD if thread_id % 2 == 0 else LIGHT_LOAD
+    share = TOTAL_SIZE / threads
+    return max(1, int(share * load / ((1 + MAX_JOB_SIZE) / 2)))
+
+
+def worker(manager, thread_id, threads, ops, barrier, strategy):
+    rng = random.Random(thread_id)
+    limit = live_limit(thread_id, threads)
+    live = deque()
+    barrier.wait()
+    for i in range(ops):
+        if len(live) >= limit:
+            manager.recycle(live.popleft())
+        job_id = (thread_id, i)
+        if manager.allocate(rng.randint(1, MAX_JOB_SIZE), strategy=strategy, job_id=job_id) is not None:
+            live.append(job_id)
+    while live:
+        manager.recycle(live.popleft())
+
+
+def run(threads, arenas, ops, strategy='first_fit'):
+    """返回 总吞吐量 ops/s 以及 stats() 中的借用、紧凑、失败次数"""
+    manager = ConcurrentMemoryManager(total_size=TOTAL_SIZE, arena_count=arenas)
+    barrier = threading.Barrier(threads + 1)
+    pool = [threading.Thread(target=worker, args=(manager, t, threads, ops, barrier, strategy))
+            for t in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stats = manager.stats()
+    # 每个操作包含一次分配和一次回收
+    return {
+        'ops': threads * ops / elapsed,
+        'steals': stats['steals'],
+        'compactions': stats['compactions'],
+        'failures': stats['failures'],
+    }
+
+
+def main():
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]}，GIL {'启用' if gil else '关闭'}，每线程 {ops} 次分配/回收")
+    print(f"{'线程数':>6} | {'全局锁 总ops/s':>14} {'紧凑':>6} {'失败':>6} | "
+          f"{'分片 总ops/s':>12} {'每线程ops/s':>11} {'借用':>7} {'紧凑':>6} {'失败':>6} | {'加速比':>6}")
+    for threads in THREAD_COUNTS:
+        single = run(threads, 1, ops)
+        sharded = run(threads, threads, ops)
+        print(f"{threads:>6} | {single['ops']:>14.0f} {single['compactions']:>6} {single['failures']:>6} | "
+              f"{sharded['ops']:>12.0f} {sharded['ops'] / threads:>11.0f} {sharded['steals']:>7} "
+              f"{sharded['compactions']:>6} {sharded['failures']:>6} | {sharded['ops'] / single['ops']:>6.2f}")
+    if gil:
+        print("ℹ️ GIL 启用时线程不能并行，加速比主要来自更少的锁等待和更短的块表；"
+              "随线程数的并行扩展需在 python3.13t 等自由线程构建中测量")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# check_history.py
+# 回退与分段统计的随机检查：Simulator 前进时记下完整状态，随机穿插回退，
+# 确认撤销日志能把块表、next_fit 地址、时间和作业状态恢复原样；
+# 同时确认增量维护的 UsageBuckets 与从头聚合的 coalesce_blocks 结果一致，
+# 并且带回退的运行与一路前进的运行结果相同。
+# 用法：python check_history.py [种子数]
+# 修改撤销日志（start_journal / undo）、UsageBuckets 或 Simulator.step 后应运行，发现不一致时退出码为 1。
+
+import random
+import sys
+
+from job import Job
+from memory_layout import MemoryLayout, coalesce_blocks
+from memory_model import MemoryManager
+from simulator import ADMISSION_POLICIES, Simulator
+
+STRATEGIES = ['first_fit', 'next_fit', 'best_fit', 'worst_fit']
+BUCKETS = 7  # 取得很小，保证大多数时刻都走聚合路径
+
+
+def state(simulator):
+    manager = simulator.manager
+    return ([(b.start, b.size, b.status, b.job_id) for b in manager.blocks],
+            manager.last_alloc_address, simulator.current_time,
+            sorted((str(j.job_id), j.status, j.remaining_time, j.start_time, j.finish_time)
+                   for j in simulator.jobs))
+
+
+def random_layout(rng):
+    kind = rng.randrange(3)
+    if kind == 0:
+        return MemoryLayout.default()
+    if kind == 1:
+        return MemoryLayout.uniform(1000, 10)
+    # 分区之间有空洞，末尾有保留区
+    return MemoryLayout.uniform(1200, rng.randint(10, 30), count=20, stride=50, reserved=[(1100, 100)])
+
+
+def make_simulator(seed):
+    rng = random.Random(seed)
+    layout = random_layout(rng)
+    manager = MemoryManager(enable_merge=rng.random() < 0.7, enable_compact=rng.random() < 0.7,
+                            verbose=False, layout=layout)
+    jobs = [Job(f"J{i}", rng.randint(1, 60), rng.randint(0, 15), rng.randint(1, 6)) for i in range(25)]
+    return Simulator(manager, jobs, rng.choice(STRATEGIES), verbose=False,
+                     admission=rng.choice(ADMISSION_POLICIES))
+
+
+def check_view(simulator):
+    manager = simulator.manager
+    if len(manager.blocks) <= BUCKETS:
+        return True
+    snap = simulator.snapshot(max_blocks=BUCKETS)
+    used = sum(b.size for b in manager.blocks if b.status == 'used')
+    return snap['blocks'] == coalesce_blocks(manager.blocks, manager.total_size, BUCKETS) and snap['used'] == used
+
+
+def finish_times(simulator):
+    return sorted((str(j.job_id), j.finish_time) for j in simulator.jobs)
+
+
+def check_seed(seed, max_ticks=40):
+    """返回第一处不一致的描述，一致时返回 None"""
+    rng = random.Random(-seed - 1)
+    simulator = make_simulator(seed)
+    states = [state(simulator)]
+    for tick in range(max_ticks):
+        if simulator.is_finished():
+            break
+        simulator.step()
+        states.append(state(simulator))
+        if not check_view(simulator):
+            return f"第 {tick} 步后分段统计与重新聚合的结果不一致"
+        if rng.random() < 0.2 and simulator.step_back():
+            states.pop()
+            if state(simulator) != states[-1]:
+                return f"第 {tick} 步回退后状态不一致"
+            if not check_view(simulator):
+                return f"第 {tick} 步回退后分段统计不一致"
+
+    # 带回退的运行继续跑完，应与一路前进的运行结果相同
+    straight = make_simulator(seed)
+    while not straight.is_finished() and straight.current_time < max_ticks * 2:
+        straight.step()
+    while not simulator.is_finished() and simulator.current_time < max_ticks * 2:
+        simulator.step()
+    if finish_times(simulator) != finish_times(straight):
+        return "带回退的运行与一路前进的运行完成时间不同"
+
+    # 一路回退到起点，每一步都应与前进时记下的状态一致
+    while simulator.current_time > states[-1][2]:
+        simulator.step_back()
+    if state(simulator) != states[-1]:
+        return f"回退到时刻 {simulator.current_time} 时状态不一致"
+    while simulator.step_back():
+        states.pop()
+        if state(simulator) != states[-1]:
+            return f"回退到时刻 {simulator.current_time} 时状态不一致"
+        if not check_view(simulator):
+            return f"回退到时刻 {simulator.current_time} 时分段统计不一致"
+    return None
+
+
+def main():
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    failures = 0
+    for seed in range(seeds):
+        problem = check_seed(seed)
+        if problem:
+            failures += 1
+            print(f"❌ 种子 {seed}: {problem}")
+    if failures:
+        print(f"❌ {failures}/{seeds} 个种子不一致")
+        return 1
+    print(f"✅ {seeds} 个种子，回退恢复的状态与分段统计均一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# check_recycle.py
+# 回收路径的随机差分检查：MemoryManager 的作业索引 + 只合并相邻块，
+# 与原始实现（线性查找作业、每次整表合并）在同样的随机分配/回收序列下逐步比较。
+# 用法：python check_recycle.py [种子数] [每个种子的操作数]
+# 修改 recycle / merge_free_blocks / _merge_neighbours / 作业索引后应运行，发现不一致时退出码为 1。
+
+import random
+import sys
+
+from memory_layout import MemoryLayout
+from memory_model import MemoryManager
+
+STRATEGIES = ['first_fit', 'next_fit', 'best_fit', 'worst_fit']
+
+
+class ReferenceManager(MemoryManager):
+    """原始的回收实现：线性查找作业所在块，启用合并时每次整表合并"""
+
+    def recycle(self, job_id):
+        for block in self.blocks:
+            if block.status == 'used' and block.job_id == job_id:
+                block.status = 'free'
+                block.job_id = None
+                break
+        if self.enable_merge:
+            old_address = self.last_alloc_address
+            self.merge_free_blocks()
+            valid_addresses = [block.start for block in self.blocks if block.start >= old_address]
+            self.last_alloc_address = min(valid_addresses) if valid_addresses else 0
+
+
+def random_layout(rng):
+    kind = rng.randrange(3)
+    if kind == 0:
+        return MemoryLayout.default()
+    if kind == 1:
+        # 分区之间留空洞，检查合并不会跨越空洞
+        return MemoryLayout.uniform(2000, rng.randint(5, 40), stride=rng.randint(40, 60))
+    return MemoryLayout.uniform(1000, rng.randint(5, 50))
+
+
+def state(manager):
+    return [(b.start, b.size, b.status, b.job_id) for b in manager.blocks], manager.last_alloc_address
+
+
+def check_seed(seed, ops):
+    """返回第一处不一致的描述，一致时返回 None"""
+    rng = random.Random(seed)
+    layout = random_layout(rng)
+    options = dict(enable_merge=rng.random() < 0.8, enable_compact=rng.random() < 0.5, verbose=False)
+    manager = MemoryManager(layout=layout, **options)
+    reference = ReferenceManager(layout=layout, **options)
+    live = []
+    for op in range(ops):
+        if live and rng.random() < 0.45:
+            # 偶尔回收不存在的作业
+            job_id = live.pop(rng.randrange(len(live))) if rng.random() < 0.95 else 'missing'
+            manager.recycle(job_id)
+            reference.recycle(job_id)
+            action = f"recycle {job_id}"
+        else:
+            size = rng.randint(1, 60)
+            strategy = rng.choice(STRATEGIES)
+            # 偶尔重复使用作业ID，检查索引在同一ID占多块时仍与线性查找一致
+            job_id = rng.choice(live) if live and rng.random() < 0.05 else f"J{op}"
+            got = manager.allocate(size, strategy, job_id)
+            want = reference.allocate(size, strategy, job_id)
+            if got != want:
+                return f"第 {op} 步 allocate({size}, {strategy}) 返回 {got}，应为 {want}"
+            if got is not None:
+                live.append(job_id)
+            action = f"allocate {job_id}"
+        if state(manager) != state(reference):
+            return f"第 {op} 步 {action} 后块表或 next_fit 地址不一致"
+    return None
+
+
+def main():
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    failures = 0
+    for seed in range(seeds):
+        problem = check_seed(seed, ops)
+        if problem:
+            failures += 1
+            print(f"❌ 种子 {seed}: {problem}")
+    if failures:
+        print(f"❌ {failures}/{seeds} 个种子不一致")
+        return 1
+    print(f"✅ {seeds} 个种子 × {ops} 次操作，回收结果与原始实现一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
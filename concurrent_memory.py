@@ -0,0 +1,166 @@
+# concurrent_memory.py
+# 并发模式的内存管理器：把 0 - total_size 的地址空间切成若干 arena，
+# 每个 arena 是一个独立加锁的 MemoryManager，多个提交线程可以同时分配和回收。
+
+import itertools
+import threading
+
+from memory_model import MemoryBlock, MemoryManager
+
+# 作业 -> arena 映射的分片数。映射按 hash(job_id) 分片，各片独立加锁，
+# 分配和回收不会在同一把全局锁上排队
+OWNER_STRIPES = 64
+
+
+class Arena:
+    def __init__(self, index, base, size, enable_merge=True, enable_compact=True):
+        self.index = index
+        self.base = base
+        self.size = size
+        self.lock = threading.Lock()
+        # arena 内部的紧凑只会移动本段地址内的块，不影响其他 arena 的分配
+        self.manager = MemoryManager(total_size=size, enable_merge=enable_merge,
+                                     enable_compact=enable_compact, verbose=False,
+                                     blocks=[MemoryBlock(base, size)])
+        # 以下计数都只在持有本 arena 的锁时修改
+        self.allocations = 0
+        self.steals = 0  # 被其他线程“借用”的次数
+        self.compactions = 0  # 本 arena 内因分配失败执行紧凑的次数
+        self.failures = 0  # 以本 arena 为主 arena 的线程分配失败的次数
+
+    def __repr__(self):
+        return f"<Arena {self.index} base={self.base} size={self.size}>"
+
+
+class ConcurrentMemoryManager:
+    def __init__(self, total_size=400, arena_count=4, enable_merge=True, enable_compact=True):
+        if arena_count < 1:
+            raise ValueError("arena_count 必须大于 0")
+        self.total_size = total_size
+        self.arenas = []
+        base = 0
+        for i in range(arena_count):
+            # 最后一个 arena 吃掉除不尽的余数
+            size = total_size // arena_count if i < arena_count - 1 else total_size - base
+            self.arenas.append(Arena(i, base, size, enable_merge, enable_compact))
+            base += size
+
+        # 作业 -> 所在 arena，回收时据此只锁对应的 arena
+        self._owner_stripes = [(threading.Lock(), {}) for _ in range(OWNER_STRIPES)]
+
+        # 每个线程首次分配时按轮转方式绑定一个 arena
+        self._affinity = threading.local()
+        self._next_arena = itertools.count()
+
+    @property
+    def failures(self):
+        return sum(arena.failures for arena in self.arenas)
+
+    def home_arena(self):
+        """当前线程绑定的 arena"""
+        return self._arena_order()[0]
+
+    def _arena_order(self):
+        """当前线程尝试 arena 的顺序：主 arena 在前，其余依次轮转。每个线程只计算一次"""
+        order = getattr(self._affinity, 'order', None)
+        if order is None:
+            home = next(self._next_arena) % len(self.arenas)
+            n = len(self.arenas)
+            order = self._affinity.order = [self.arenas[(home + i) % n] for i in range(n)]
+        return order
+
+    def _owner_stripe(self, job_id):
+        return self._owner_stripes[hash(job_id) % OWNER_STRIPES]
+
+    def allocate(self, job_size, strategy='first_fit', job_id=None):
+        order = self._arena_order()
+
+        # 第一轮：只做普通分配，不紧凑；其他 arena 只尝试非阻塞加锁，忙就跳过
+        for i, arena in enumerate(order):
+            if i == 0:
+                arena.lock.acquire()
+            elif not arena.lock.acquire(blocking=False):
+                continue
+            try:
+                arena.manager.current_strategy = strategy
+                addr = arena.manager._allocate_once(job_size, strategy, job_id)
+                if addr is not None:
+                    self._count(arena, stolen=i > 0)
+            finally:
+                arena.lock.release()
+            if addr is not None:
+                return self._record(arena, job_id, addr)
+
+        # 第二轮：逐个 arena 阻塞加锁，分配失败时仅在该 arena 内紧凑
+        for i, arena in enumerate(order):
+            with arena.lock:
+                manager = arena.manager
+                manager.current_strategy = strategy
+                addr = manager._allocate_once(job_size, strategy, job_id)
+                if addr is None and manager.enable_compact:
+                    manager.compact()
+                    arena.compactions += 1
+                    addr = manager._allocate_once(job_size, strategy, job_id)
+                if addr is not None:
+                    self._count(arena, stolen=i > 0)
+            if addr is not None:
+                return self._record(arena, job_id, addr)
+
+        home = order[0]
+        with home.lock:
+            home.failures += 1
+        return None
+
+    @staticmethod
+    def _count(arena, stolen):
+        # 调用方持有 arena 的锁
+        arena.allocations += 1
+        if stolen:
+            arena.steals += 1
+
+    def _record(self, arena, job_id, addr):
+        lock, owners = self._owner_stripe(job_id)
+        with lock:
+            owners[job_id] = arena
+        return addr
+
+    def recycle(self, job_id):
+        lock, owners = self._owner_stripe(job_id)
+        with lock:
+            arena = owners.pop(job_id, None)
+        if arena is None:
+            return
+        with arena.lock:
+            arena.manager.recycle(job_id)
+
+    def compact(self):
+        """逐个 arena 紧凑，任何时刻只有一个 arena 被锁住"""
+        for arena in self.arenas:
+            with arena.lock:
+                arena.manager.compact()
+
+    @property
+    def blocks(self):
+        """所有 arena 的内存块，按地址排序，供界面显示"""
+        result = []
+        for arena in self.arenas:
+            with arena.lock:
+                result.extend(arena.manager.blocks)
+        return result
+
+    def stats(self):
+        return {
+            'arenas': [{
+                'index': arena.index,
+                'base': arena.base,
+                'size': arena.size,
+                'allocations': arena.allocations,
+                'steals': arena.steals,
+                'compactions': arena.compactions,
+                'failures': arena.failures,
+                'used': sum(b.size for b in arena.manager.blocks if b.status == 'used'),
+            } for arena in self.arenas],
+            'steals': sum(arena.steals for arena in self.arenas),
+            'compactions': sum(arena.compactions for arena in self.arenas),
+            'failures': self.failures,
+        }
@@ -6,4 +6,5 @@ class Job:
         self.run_time = run_time
         self.remaining_time = run_time
         self.status = 'waiting'  # 'waiting', 'running', 'finished'
+        self.start_time = None  # 进入内存的时间，用于统计等待时间
         self.finish_time = None
\ No newline at end of file
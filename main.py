@@ -7,10 +7,21 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import QTimer, Qt
 from memory_canvas import MemoryCanvas
 from memory_model import MemoryManager
+from memory_layout import MemoryLayout
+from simulator import Simulator, job_snapshot, ADMISSION_POLICIES
+from simulation_worker import SimulationWorker
 from job import Job
 import sys
+import os
 import json
-import copy
+
+
+# 速度档位 11 为极速模式：后台线程不限速运行，界面只按帧率采样
+TURBO_SPEED = 11
+# 界面刷新间隔（毫秒），约 30 fps
+FRAME_INTERVAL_MS = 33
+# 内存布局文件，不存在时使用原始的 7 分区布局
+LAYOUT_FILE = "memory_layout.json"
 
 
 class MainWindow(QWidget):
@@ -29,6 +40,12 @@ class MainWindow(QWidget):
         self.strategy_select = QComboBox()
         # 删除了 'quick_fit', 'buddy', 'hash_fit'
         self.strategy_select.addItems(['first_fit', 'next_fit', 'best_fit', 'worst_fit'])
+        self.strategy_select.currentTextChanged.connect(self.on_strategy_changed)
+
+        # 新增：准入策略（greedy 为原有的按序尝试）
+        self.admission_select = QComboBox()
+        self.admission_select.addItems(ADMISSION_POLICIES)
+        self.admission_select.currentTextChanged.connect(self.on_admission_changed)
 
         # 新增：功能开关控件
         self.enable_merge_checkbox = QCheckBox("启用内存合并")
@@ -53,7 +70,7 @@ class MainWindow(QWidget):
         # 速度滑块
         self.speed_slider = QSlider(Qt.Horizontal)
         self.speed_slider.setMinimum(1)  # 最慢：3秒一步
-        self.speed_slider.setMaximum(10)  # 最快：0.1秒一步
+        self.speed_slider.setMaximum(TURBO_SPEED)  # 10：0.1秒一步；11：极速不限速
         self.speed_slider.setValue(5)  # 默认：1秒一步
         self.speed_slider.setTickPosition(QSlider.TicksBelow)
         self.speed_slider.setTickInterval(1)
@@ -68,11 +85,13 @@ class MainWindow(QWidget):
         self.btn_normal = QPushButton("正常")
         self.btn_fast = QPushButton("快速")
         self.btn_ultra_fast = QPushButton("极速")
+        self.btn_turbo = QPushButton("不限速")
 
         self.btn_slow.clicked.connect(lambda: self.set_speed_preset(2))
         self.btn_normal.clicked.connect(lambda: self.set_speed_preset(5))
         self.btn_fast.clicked.connect(lambda: self.set_speed_preset(8))
         self.btn_ultra_fast.clicked.connect(lambda: self.set_speed_preset(10))
+        self.btn_turbo.clicked.connect(lambda: self.set_speed_preset(TURBO_SPEED))
 
         speed_layout.addWidget(QLabel("慢"))
         speed_layout.addWidget(self.speed_slider)
@@ -82,6 +101,7 @@ class MainWindow(QWidget):
         speed_layout.addWidget(self.btn_normal)
         speed_layout.addWidget(self.btn_fast)
         speed_layout.addWidget(self.btn_ultra_fast)
+        speed_layout.addWidget(self.btn_turbo)
         speed_group.setLayout(speed_layout)
 
         self.btn_reset = QPushButton("🔁 重置并开始调度")
@@ -99,6 +119,8 @@ class MainWindow(QWidget):
         control_layout = QHBoxLayout()
         control_layout.addWidget(QLabel("调度策略:"))
         control_layout.addWidget(self.strategy_select)
+        control_layout.addWidget(QLabel("准入策略:"))
+        control_layout.addWidget(self.admission_select)
         control_layout.addWidget(self.btn_reset)
         control_layout.addWidget(self.btn_pause)
         control_layout.addWidget(self.btn_resume)
@@ -158,10 +180,13 @@ class MainWindow(QWidget):
 
         self.manager = None
         self.jobs = []
+        # 调度在后台线程中运行，界面定时器只负责按帧率取最新快照重绘
+        self.worker = None
+        self.last_version = -1
+        self.finish_reported = False
         self.timer = QTimer()
-        self.history = []  # 用于保存历史记录
-        self.timer.timeout.connect(self.step)
-        self.current_time = 0
+        self.timer.timeout.connect(self.refresh_frame)
+        self.timer.start(FRAME_INTERVAL_MS)
 
         # 初始化速度
         self.current_speed = 5
@@ -170,32 +195,42 @@ class MainWindow(QWidget):
     def on_merge_checkbox_changed(self, state):
         """内存合并开关变化处理"""
         enabled = state == 2  # 2 表示选中状态
-        if self.manager:
-            self.manager.set_merge_enabled(enabled)
+        if self.worker:
+            self.worker.call(lambda sim, e: sim.manager.set_merge_enabled(e), enabled)
         self.update_feature_status()
 
     def on_compact_checkbox_changed(self, state):
         """内存紧凑开关变化处理"""
         enabled = state == 2  # 2 表示选中状态
-        if self.manager:
-            self.manager.set_compact_enabled(enabled)
+        if self.worker:
+            self.worker.call(lambda sim, e: sim.manager.set_compact_enabled(e), enabled)
         self.update_feature_status()
 
     def on_speed_changed(self, value):
         """速度滑块变化处理"""
         self.current_speed = value
         self.update_speed_display()
-        # 如果定时器正在运行，更新间隔
-        if self.timer.isActive():
-            self.timer.setInterval(self.get_timer_interval())
+        # 如果后台调度正在运行，更新间隔
+        if self.worker:
+            self.worker.set_interval(self.get_timer_interval() / 1000)
 
     def set_speed_preset(self, speed_value):
         """设置预设速度"""
         self.speed_slider.setValue(speed_value)
         self.current_speed = speed_value
         self.update_speed_display()
-        if self.timer.isActive():
-            self.timer.setInterval(self.get_timer_interval())
+        if self.worker:
+            self.worker.set_interval(self.get_timer_interval() / 1000)
+
+    def on_admission_changed(self, admission):
+        """准入策略变化处理，下一步起生效"""
+        if self.worker:
+            self.worker.call(lambda sim, a: setattr(sim, 'admission', a), admission)
+
+    def on_strategy_changed(self, strategy):
+        """调度策略变化处理，下一步起生效"""
+        if self.worker:
+            self.worker.call(lambda sim, s: setattr(sim, 'strategy', s), strategy)
 
     def get_timer_interval(self):
         """根据速度值计算定时器间隔（毫秒）"""
@@ -211,12 +246,15 @@ class MainWindow(QWidget):
             7: 600,  # 0.6秒 - 1.67x
             8: 400,  # 0.4秒 - 2.5x
             9: 200,  # 0.2秒 - 5.0x
-            10: 100  # 0.1秒 - 10.0x
+            10: 100,  # 0.1秒 - 10.0x
+            TURBO_SPEED: 0  # 不限速
         }
         return intervals.get(self.current_speed, 1000)
 
     def get_speed_multiplier(self):
-        """获取速度倍数用于显示"""
+        """获取速度倍数用于显示，极速模式返回 None"""
+        if self.current_speed == TURBO_SPEED:
+            return None
         speed_multipliers = {
             1: 0.33, 2: 0.5, 3: 0.67, 4: 0.83, 5: 1.0,
             6: 1.25, 7: 1.67, 8: 2.5, 9: 5.0, 10: 10.0
@@ -225,12 +263,11 @@ class MainWindow(QWidget):
 
     def update_speed_display(self):
         """更新速度显示"""
-        multiplier = self.get_speed_multiplier()
-        self.speed_label.setText(f"速度: {multiplier}x")
+        self.speed_label.setText(f"速度: {self.get_speed_text()}")
 
         # 根据速度更新按钮样式
-        buttons = [self.btn_slow, self.btn_normal, self.btn_fast, self.btn_ultra_fast]
-        speeds = [2, 5, 8, 10]
+        buttons = [self.btn_slow, self.btn_normal, self.btn_fast, self.btn_ultra_fast, self.btn_turbo]
+        speeds = [2, 5, 8, 10, TURBO_SPEED]
 
         for i, (button, speed) in enumerate(zip(buttons, speeds)):
             if self.current_speed == speed:
@@ -238,6 +275,10 @@ class MainWindow(QWidget):
             else:
                 button.setStyleSheet("")
 
+    def get_speed_text(self):
+        multiplier = self.get_speed_multiplier()
+        return "不限速" if multiplier is None else f"{multiplier}x"
+
     def update_feature_status(self):
         """更新功能状态显示"""
         merge_status = "✅" if self.enable_merge_checkbox.isChecked() else "❌"
@@ -249,39 +290,48 @@ class MainWindow(QWidget):
         merge_enabled = self.enable_merge_checkbox.isChecked()
         compact_enabled = self.enable_compact_checkbox.isChecked()
 
-        self.manager = MemoryManager(enable_merge=merge_enabled, enable_compact=compact_enabled)
-        self.jobs = self.load_jobs()
-        self.current_time = 0
-        self.history = []  # 清空历史记录
+        if self.worker:
+            self.worker.stop()
 
-        # 使用当前速度设置启动定时器
-        interval = self.get_timer_interval()
-        self.timer.start(interval)
+        memory_layout = self.load_layout()
+        self.manager = MemoryManager(enable_merge=merge_enabled, enable_compact=compact_enabled,
+                                     layout=memory_layout)
+        self.canvas.set_layout(memory_layout.total_size, memory_layout.unit, memory_layout.reserved)
+        self.jobs = self.load_jobs()
+        simulator = Simulator(self.manager, self.jobs, strategy=self.strategy_select.currentText(),
+                              admission=self.admission_select.currentText())
+        self.worker = SimulationWorker(simulator)
+        self.last_version = -1
+        self.finish_reported = False
 
-        self.update_canvas()
-        self.update_job_table()
-        self.update_status_bar()
+        # 使用当前速度设置启动后台调度
+        self.worker.set_interval(self.get_timer_interval() / 1000)
+        self.worker.resume()
+        self.refresh_frame()
 
-        multiplier = self.get_speed_multiplier()
         print("🎬 调度开始...", flush=True)
         print(f"🔧 内存合并: {'启用' if merge_enabled else '禁用'}")
         print(f"🔧 内存紧凑: {'启用' if compact_enabled else '禁用'}")
-        print(f"⚡ 模拟速度: {multiplier}x ({self.get_timer_interval()}ms间隔)")
+        print(f"⚡ 模拟速度: {self.get_speed_text()} ({self.get_timer_interval()}ms间隔)")
 
     def pause_simulation(self):
-        self.timer.stop()
-        multiplier = self.get_speed_multiplier()
-        print(f"⏸ 模拟暂停 (当前速度: {multiplier}x)")
+        if self.worker:
+            self.worker.pause()
+        print(f"⏸ 模拟暂停 (当前速度: {self.get_speed_text()})")
 
     def resume_simulation(self):
-        # 使用当前速度设置重启定时器
-        interval = self.get_timer_interval()
-        self.timer.start(interval)
-        multiplier = self.get_speed_multiplier()
-        print(f"▶️ 模拟继续 (速度: {multiplier}x)")
+        if not self.worker:
+            return
+        # 使用当前速度设置继续后台调度
+        self.worker.set_interval(self.get_timer_interval() / 1000)
+        self.worker.resume()
+        print(f"▶️ 模拟继续 (速度: {self.get_speed_text()})")
 
     def step_once(self):
-        self.step()
+        if not self.worker:
+            return
+        self.worker.step_once()
+        self.refresh_frame()
         print("⏭ 单步执行完成")
 
     def load_jobs(self):
@@ -293,6 +343,15 @@ class MainWindow(QWidget):
             print(f"❌ 读取 job_data.json 出错：{e}")
             return []
 
+    def load_layout(self):
+        if not os.path.exists(LAYOUT_FILE):
+            return MemoryLayout.default()
+        try:
+            return MemoryLayout.from_file(LAYOUT_FILE)
+        except Exception as e:
+            print(f"❌ 读取 {LAYOUT_FILE} 出错，使用默认布局：{e}")
+            return MemoryLayout.default()
+
     def add_job(self):
         try:
             job_id = self.input_job_id.text().strip()
@@ -300,8 +359,12 @@ class MainWindow(QWidget):
             arrival = int(self.input_arrival.text())
             runtime = int(self.input_runtime.text())
             new_job = Job(job_id, size, arrival, runtime)
-            self.jobs.append(new_job)
-            self.update_job_table()
+            if self.worker:
+                self.worker.add_job(new_job)
+                self.refresh_frame()
+            else:
+                self.jobs.append(new_job)
+                self.update_job_table({'jobs': [job_snapshot(job) for job in self.jobs]})
             self.input_job_id.clear()
             self.input_size.clear()
             self.input_arrival.clear()
@@ -310,107 +373,75 @@ class MainWindow(QWidget):
         except Exception as e:
             print(f"❌ 添加作业失败：{e}")
 
-    def step(self):
-        # 保存快照（作业状态、内存块、当前时间）
-        self.history.append({
-            "jobs": copy.deepcopy(self.jobs),
-            "blocks": copy.deepcopy(self.manager.blocks),
-            "current_time": self.current_time
-        })
-
-        self.current_time += 1
-        print(f"\n⏱ 当前时间: {self.current_time}")
-
-        for job in self.jobs:
-            if job.status == 'waiting' and job.arrival_time <= self.current_time:
-                addr = self.manager.allocate(job.size, strategy=self.strategy_select.currentText(), job_id=job.job_id)
-                if addr is not None:
-                    job.status = 'running'
-                    print(f"✅ 作业 {job.job_id} 进入内存，起始地址: {addr}MB")
-                else:
-                    print(f"🕓 作业 {job.job_id} 等待中，内存不足")
-
-            elif job.status == 'running':
-                job.remaining_time -= 1
-                print(f"▶️ 作业 {job.job_id} 运行中，剩余时间: {job.remaining_time}s")
-                if job.remaining_time <= 0:
-                    job.status = 'finished'
-                    job.finish_time = self.current_time
-                    self.manager.recycle(job.job_id)
-                    print(f"✅ 作业 {job.job_id} 已完成并释放内存")
-
-        self.update_canvas()
-        self.update_job_table()
-        self.update_status_bar()
-
-        if all(job.status == 'finished' for job in self.jobs):
-            self.timer.stop()
+    def refresh_frame(self):
+        """按帧率采样后台调度的最新状态，只在状态变化时重绘"""
+        if not self.worker:
+            return
+        if self.worker.version == self.last_version:
+            return
+
+        snapshot = self.worker.snapshot(max_blocks=MemoryCanvas.MAX_DRAW_BLOCKS)
+        self.last_version = snapshot['version']
+        self.update_canvas(snapshot)
+        self.update_job_table(snapshot)
+        self.update_status_bar(snapshot)
+
+        if snapshot['finished'] and not self.finish_reported:
+            self.finish_reported = True
             print("🎉 所有作业执行完毕！")
 
-    def update_canvas(self):
-        memory_state = []
-        for block in self.manager.blocks:
-            block_type = 'free' if block.status == 'free' else 'used'
-            memory_state.append({
-                'start': block.start,
-                'size': block.size,
-                'type': block_type,
-                'job_id': block.job_id
-            })
-        self.canvas.update_blocks(memory_state)
-
-    def update_job_table(self):
-        status_order = {'running': 0, 'waiting': 1, 'finished': 2}
-        self.jobs.sort(key=lambda j: (status_order.get(j.status, 3), j.arrival_time))
-
-        self.job_table.setRowCount(len(self.jobs))
-        for row, job in enumerate(self.jobs):
-            self.job_table.setItem(row, 0, QTableWidgetItem(str(job.job_id)))
-            self.job_table.setItem(row, 1, QTableWidgetItem(str(job.size)))
-            self.job_table.setItem(row, 2, QTableWidgetItem(str(job.arrival_time)))
-            self.job_table.setItem(row, 3, QTableWidgetItem(str(job.remaining_time if job.status != 'finished' else 0)))
-            status_item = QTableWidgetItem(str(job.status))
-            if job.status == 'running':
+    def update_canvas(self, snapshot):
+        self.canvas.update_blocks(snapshot['blocks'])
+
+    def update_job_table(self, snapshot):
+        # 作业顺序由调度器维护（运行中 / 等待 / 完成 + 到达时间）
+        jobs = snapshot['jobs']
+        self.job_table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            self.job_table.setItem(row, 0, QTableWidgetItem(str(job['job_id'])))
+            self.job_table.setItem(row, 1, QTableWidgetItem(str(job['size'])))
+            self.job_table.setItem(row, 2, QTableWidgetItem(str(job['arrival_time'])))
+            self.job_table.setItem(row, 3, QTableWidgetItem(str(job['remaining_time'])))
+            status_item = QTableWidgetItem(str(job['status']))
+            if job['status'] == 'running':
                 status_item.setBackground(QColor(0, 255, 0, 50))
-            elif job.status == 'waiting':
+            elif job['status'] == 'waiting':
                 status_item.setBackground(QColor(128, 128, 128, 50))
-            elif job.status == 'finished':
+            elif job['status'] == 'finished':
                 status_item.setBackground(QColor(150, 150, 255, 50))
             self.job_table.setItem(row, 4, status_item)
             self.job_table.setItem(row, 5,
-                                   QTableWidgetItem(str(job.finish_time) if job.finish_time is not None else ""))
+                                   QTableWidgetItem(str(job['finish_time']) if job['finish_time'] is not None else ""))
 
-    def update_status_bar(self):
-        used = sum(b.size for b in self.manager.blocks if b.status == 'used')
-        total = sum(b.size for b in self.manager.blocks)
+    def update_status_bar(self, snapshot):
+        used = snapshot['used']
+        total = snapshot['total']
+        unit = snapshot['unit']
         utilization = (used / total) * 100 if total else 0
-        finished = sum(1 for job in self.jobs if job.status == 'finished')
-        total_jobs = len(self.jobs)
-
-        # 获取当前速度倍数
-        speed_multiplier = self.get_speed_multiplier()
+        finished = sum(1 for job in snapshot['jobs'] if job['status'] == 'finished')
+        total_jobs = len(snapshot['jobs'])
 
         self.status_label.setText(
-            f"⏱ 当前时间: {self.current_time}s ｜ "
-            f"📊 内存使用率: {utilization:.1f}% ({used}/{total}MB) ｜ "
+            f"⏱ 当前时间: {snapshot['current_time']}s ｜ "
+            f"📊 内存使用率: {utilization:.1f}% ({used}/{total}{unit}) ｜ "
             f"✅ 作业完成: {finished}/{total_jobs} ｜ "
-            f"⚡ 速度: {speed_multiplier}x"
+            f"⚡ 速度: {self.get_speed_text()}"
         )
 
     def step_back(self):
-        if not self.history:
+        if not self.worker or not self.worker.step_back():
             print("❌ 无法回退，已是最初状态")
             return
 
-        last_state = self.history.pop()
-        self.jobs = copy.deepcopy(last_state["jobs"])
-        self.manager.blocks = copy.deepcopy(last_state["blocks"])
-        self.current_time = last_state["current_time"]
+        self.refresh_frame()
+        print(f"🔙 回退到时间: {self.worker.simulator.current_time}s")
 
-        self.update_canvas()
-        self.update_job_table()
-        self.update_status_bar()
-        print(f"🔙 回退到时间: {self.current_time}s")
+    def closeEvent(self, event):
+        """关闭窗口时停止后台调度线程"""
+        self.timer.stop()
+        if self.worker:
+            self.worker.stop()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
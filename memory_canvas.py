@@ -4,9 +4,14 @@ from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsRectItem, QG
 from PyQt5.QtGui import QColor, QBrush, QFont, QPen
 
 class MemoryCanvas(QGraphicsView):
+    # 超过这个块数时由模拟器按像素聚合后再绘制
+    MAX_DRAW_BLOCKS = 2000
+
     def __init__(self, total_size=400, parent=None):
         super().__init__(parent)
         self.total_size = total_size
+        self.unit = 'MB'
+        self.reserved = []
 
         # 3. 移除固定尺寸，设置最小尺寸和尺寸策略
         self.setMinimumSize(400, 80)  # 设置最小尺寸
@@ -34,7 +39,7 @@ class MemoryCanvas(QGraphicsView):
         self.scene().addItem(bg)
 
         # 图例文字
-        legend = QGraphicsSimpleTextItem("🟩 空闲区  🟥 已用区")
+        legend = QGraphicsSimpleTextItem("🟩 空闲区  🟥 已用区  🟧 部分占用  ⬛ 保留区")
         legend.setPos(5, 45)
         legend.setBrush(QColor(0, 0, 0))
         legend.setFont(QFont("Arial", 9))
@@ -43,6 +48,12 @@ class MemoryCanvas(QGraphicsView):
         # 6. 更新场景矩形
         self.setSceneRect(0, 0, view_width, 70)
 
+    def set_layout(self, total_size, unit='MB', reserved=()):
+        """布局变化时更新地址空间大小、单位和保留区"""
+        self.total_size = total_size
+        self.unit = unit
+        self.reserved = list(reserved)
+
     def update_blocks(self, memory_blocks):
         """绘制每个内存块 - 自适应版本"""
         self.draw_background()
@@ -62,6 +73,8 @@ class MemoryCanvas(QGraphicsView):
                 color = QColor(255, 255, 100)
             elif block['type'] == 'free':
                 color = QColor(0, 200, 0)
+            elif block['type'] == 'mixed':
+                color = QColor(230, 140, 0)
             else:
                 color = QColor(200, 0, 0)
 
@@ -69,13 +82,19 @@ class MemoryCanvas(QGraphicsView):
             rect.setBrush(QBrush(color))
 
             # 添加黑色边框
-            pen = QPen(QColor(0, 0, 0))
-            pen.setWidth(1)
-            rect.setPen(pen)
+            # 宽度不足 2 像素的块不画边框，否则大布局下整条都是黑线
+            if w >= 2:
+                pen = QPen(QColor(0, 0, 0))
+                pen.setWidth(1)
+                rect.setPen(pen)
+            else:
+                rect.setPen(QPen(color))
 
             # 鼠标悬浮提示
-            tooltip = f"起始地址: {block['start']}MB\n大小: {block['size']}MB"
-            if block['type'] == 'used' and 'job_id' in block:
+            tooltip = f"起始地址: {block['start']}{self.unit}\n大小: {block['size']}{self.unit}"
+            if block['type'] == 'mixed':
+                tooltip += f"\n已用: {block['used']}{self.unit}"
+            if block['type'] == 'used' and block.get('job_id') is not None:
                 tooltip += f"\n作业ID: {block['job_id']}"
             rect.setToolTip(tooltip)
             self.scene().addItem(rect)
@@ -84,7 +103,7 @@ class MemoryCanvas(QGraphicsView):
             min_width_for_label = 25  # 最小宽度才显示标签
             if w >= min_width_for_label:
                 # 大小标签
-                label = QGraphicsSimpleTextItem(f"{block['size']}MB")
+                label = QGraphicsSimpleTextItem(f"{block['size']}{self.unit}")
                 font_size = max(6, min(8, int(w / 8)))  # 根据宽度调整字体大小
                 label.setFont(QFont("Arial", font_size))
                 label.setBrush(QColor(255, 255, 255))
@@ -92,13 +111,21 @@ class MemoryCanvas(QGraphicsView):
                 self.scene().addItem(label)
 
                 # 作业ID标签
-                if block['type'] == 'used' and 'job_id' in block:
+                if block['type'] == 'used' and block.get('job_id') is not None:
                     job_label = QGraphicsSimpleTextItem(str(block['job_id']))
                     job_label.setFont(QFont("Arial", font_size - 1))
                     job_label.setBrush(QColor(255, 255, 255))
                     job_label.setPos(x + w / 2 - job_label.boundingRect().width() / 2, 24)
                     self.scene().addItem(job_label)
 
+        # 保留区最后画，聚合显示时即使某段与保留区相邻、按像素取整后重叠，也不会把保留区盖住
+        for start, size in self.reserved:
+            rect = QGraphicsRectItem(start / self.total_size * view_width, 0,
+                                     size / self.total_size * view_width, 40)
+            rect.setBrush(QBrush(QColor(60, 60, 60)))
+            rect.setToolTip(f"保留区\n起始地址: {start}{self.unit}\n大小: {size}{self.unit}")
+            self.scene().addItem(rect)
+
     def resizeEvent(self, event):
         """9. 窗口大小改变时重新绘制"""
         super().resizeEvent(event)
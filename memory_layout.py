@@ -0,0 +1,225 @@
+# memory_layout.py
+# 内存布局：总大小、初始空闲分区和保留区改为由布局文件或生成器给出，不再写死在 MemoryManager 中。
+# 分区起址/大小存放在 array 中，可以批量生成上百万个分区；地址空间用整数表示，支持到 TB 级字节粒度。
+#
+# 布局文件（JSON）示例：
+#     {
+#       "total_size": 400,
+#       "unit": "MB",
+#       "partitions": [[0, 20], [20, 20]],
+#       "generate": [{"start": 100, "count": 4, "size": 25}],
+#       "reserved": [[380, 20]]
+#     }
+# partitions 为显式列出的分区；generate 中每项批量生成 count 个大小为 size 的分区，
+# 相邻起址间隔 stride（默认等于 size）；reserved 为不参与分配、紧凑时也不会被占用的保留区。
+
+import hashlib
+import json
+from array import array
+from bisect import bisect_left
+
+from memory_model import MemoryBlock
+
+UNIT_BYTES = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4, 'page': 4096}
+
+
+class MemoryLayout:
+    def __init__(self, total_size, starts, sizes, reserved=(), unit='MB'):
+        if unit not in UNIT_BYTES:
+            raise ValueError(f"未知的内存单位: {unit}")
+        self.total_size = total_size
+        self.unit = unit
+        self.starts = starts if isinstance(starts, array) else array('q', starts)
+        self.sizes = sizes if isinstance(sizes, array) else array('q', sizes)
+        self.reserved = sorted((int(s), int(z)) for s, z in reserved)
+        self._sort_and_validate()
+
+    @classmethod
+    def default(cls):
+        """课程要求中的原始布局：20M×3、30M×2、40M×2，位于 0 - 400M 的用户空间内"""
+        return cls(400, [0, 20, 40, 60, 90, 120, 160], [20, 20, 20, 30, 30, 40, 40])
+
+    @classmethod
+    def uniform(cls, total_size, partition_size, count=None, start=0, stride=None, reserved=(), unit='MB'):
+        """批量生成等大小分区，count 缺省时铺满 start 之后的空间"""
+        stride = stride or partition_size
+        if count is None:
+            count = (total_size - start - partition_size) // stride + 1 if total_size - start >= partition_size else 0
+        starts = array('q', range(start, start + count * stride, stride))
+        sizes = array('q', [partition_size]) * count
+        return cls(total_size, starts, sizes, reserved, unit)
+
+    @classmethod
+    def from_dict(cls, data):
+        starts = array('q')
+        sizes = array('q')
+        for start, size in data.get('partitions', []):
+            starts.append(start)
+            sizes.append(size)
+        for run in data.get('generate', []):
+            size = run['size']
+            stride = run.get('stride', size)
+            count = run['count']
+            starts.extend(range(run.get('start', 0), run.get('start', 0) + count * stride, stride))
+            sizes.extend(array('q', [size]) * count)
+        return cls(data['total_size'], starts, sizes, data.get('reserved', []), data.get('unit', 'MB'))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def _sort_and_validate(self):
+        if len(self.starts) != len(self.sizes):
+            raise ValueError("分区起址与大小数量不一致")
+        starts, sizes = self.starts, self.sizes
+        # 只有乱序时才排序，按顺序给出的大布局可以跳过这一步
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            self.starts = starts = array('q', (starts[i] for i in order))
+            self.sizes = sizes = array('q', (sizes[i] for i in order))
+
+        end = 0
+        for start, size in zip(starts, sizes):
+            if size <= 0:
+                raise ValueError(f"分区大小必须为正数: 起址 {start}")
+            if start < end:
+                raise ValueError(f"分区重叠: 起址 {start}")
+            end = start + size
+        if end > self.total_size:
+            raise ValueError(f"分区超出总大小 {self.total_size}")
+
+        prev_end = 0
+        for start, size in self.reserved:
+            if start < prev_end or start + size > self.total_size or size <= 0:
+                raise ValueError(f"保留区非法: 起址 {start}, 大小 {size}")
+            prev_end = start + size
+            if self._overlaps_partition(start, start + size):
+                raise ValueError(f"保留区与分区重叠: 起址 {start}")
+
+    def _overlaps_partition(self, lo, hi):
+        i = bisect_left(self.starts, hi)
+        return i > 0 and self.starts[i - 1] + self.sizes[i - 1] > lo
+
+    def __len__(self):
+        return len(self.starts)
+
+    def build_blocks(self):
+        """生成 MemoryManager 使用的初始空闲块列表"""
+        return list(map(MemoryBlock, self.starts, self.sizes))
+
+    def to_dict(self):
+        return {
+            'total_size': self.total_size,
+            'unit': self.unit,
+            'partitions': [[s, z] for s, z in zip(self.starts, self.sizes)],
+            'reserved': [list(r) for r in self.reserved],
+        }
+
+    def fingerprint(self):
+        """布局内容的哈希，用于结果缓存的键；直接哈希数组字节，大布局也很快"""
+        h = hashlib.sha256()
+        h.update(json.dumps([self.total_size, self.unit, self.reserved]).encode('utf-8'))
+        h.update(self.starts.tobytes())
+        h.update(self.sizes.tobytes())
+        return h.hexdigest()
+
+
+class UsageBuckets:
+    """按地址把内存分成 buckets 段，统计每段被块覆盖的大小和已用大小，供界面按段绘制。
+    块覆盖的地址在模拟过程中不变，覆盖量只需在 rebuild 时计算；已用量由 MemoryManager
+    在分配/回收时通过 add 增量更新，紧凑、回退等整体改动后标记为 dirty 再重建。
+    段边界取整数地址，增减都是整数运算，不会因浮点误差把空闲段误判为部分占用。
+    分区之间的空洞和保留区不属于任何块，只被部分覆盖的段按覆盖量缩短，不把空洞画成空闲区"""
+
+    def __init__(self, total_size, buckets):
+        self.total_size = total_size
+        self.buckets = buckets
+        self.used = [0] * buckets
+        self.covered = [0] * buckets
+        self.first = [0] * buckets  # 每段内被覆盖的最低地址
+        self.used_total = 0
+        self.covered_total = 0
+        self.dirty = True
+
+    def _boundary(self, i):
+        return i * self.total_size // self.buckets
+
+    def _spread(self, counts, start, size, sign=1, first=None):
+        """把 [start, start+size) 按段累加到 counts，小块只落在一个段里。
+        给出 first 时同时记录各段被覆盖的最低地址"""
+        buckets = self.buckets
+        end = start + size
+        i = min(((start + 1) * buckets - 1) // self.total_size, buckets - 1)
+        while start < end:
+            bucket_end = self._boundary(i + 1) if i < buckets - 1 else self.total_size
+            part = min(end, bucket_end) - start
+            if first is not None and (not counts[i] or start < first[i]):
+                first[i] = start
+            counts[i] += sign * part
+            start += part
+            i += 1
+
+    def rebuild(self, blocks):
+        self.used = [0] * self.buckets
+        self.covered = [0] * self.buckets
+        self.first = [0] * self.buckets
+        self.used_total = 0
+        self.covered_total = 0
+        for block in blocks:
+            self._spread(self.covered, block.start, block.size, first=self.first)
+            self.covered_total += block.size
+            if block.status == 'used':
+                self._spread(self.used, block.start, block.size)
+                self.used_total += block.size
+        self.dirty = False
+
+    def add(self, start, size, sign):
+        """分配时 sign 为 1，回收时为 -1"""
+        if self.dirty:
+            return
+        self._spread(self.used, start, size, sign)
+        self.used_total += sign * size
+
+    def invalidate(self):
+        self.dirty = True
+
+    def segments(self):
+        """返回 start/size/type/used 段列表，type 为 free、used 或 mixed（部分占用）。
+        整段被覆盖时 start/size 为段的边界；部分覆盖时从段内最低的覆盖地址起、长度为覆盖量"""
+        result = []
+        for i in range(self.buckets):
+            covered = self.covered[i]
+            if not covered:
+                continue
+            used = self.used[i]
+            start = self._boundary(i)
+            size = (self._boundary(i + 1) if i < self.buckets - 1 else self.total_size) - start
+            if covered < size:
+                start = self.first[i]
+                size = covered
+            if used == 0:
+                block_type = 'free'
+            elif used == covered:
+                block_type = 'used'
+            else:
+                block_type = 'mixed'
+            # 相邻同类型的段再合并一次，减少图元数量
+            if result and result[-1]['type'] == block_type and block_type != 'mixed' \
+                    and result[-1]['start'] + result[-1]['size'] == start:
+                result[-1]['size'] += size
+                result[-1]['used'] += used
+            else:
+                result.append({'start': start, 'size': size, 'type': block_type,
+                               'used': used, 'job_id': None})
+        return result
+
+
+def coalesce_blocks(blocks, total_size, buckets):
+    """把大量内存块聚合为至多 buckets 段用于显示。
+    每段返回 start/size/type/used，type 为 free、used 或 mixed（部分占用），used 为已用大小"""
+    if buckets <= 0 or total_size <= 0:
+        return []
+    view = UsageBuckets(total_size, buckets)
+    view.rebuild(blocks)
+    return view.segments()
@@ -1,9 +1,13 @@
 import copy
+from bisect import bisect_left
 from collections import defaultdict
 from math import ceil, log2
 
 
 class MemoryBlock:
+    # 大布局下会有上百万个块，使用 __slots__ 降低构造开销和内存占用
+    __slots__ = ('start', 'size', 'status', 'job_id')
+
     def __init__(self, start, size, status='free', job_id=None):
         self.start = start
         self.size = size
@@ -14,13 +18,33 @@ class MemoryBlock:
 
 
 class MemoryManager:
-    def __init__(self, total_size=400, enable_merge=True, enable_compact=True):
-        self.total_size = total_size
-        self.blocks = [
-            MemoryBlock(0, 20), MemoryBlock(20, 20), MemoryBlock(40, 20),
-            MemoryBlock(60, 30), MemoryBlock(90, 30),
-            MemoryBlock(120, 40), MemoryBlock(160, 40),
-        ]
+    def __init__(self, total_size=None, enable_merge=True, enable_compact=True, verbose=True, blocks=None,
+                 layout=None):
+        # 是否输出过程日志；后台高速运行时关闭，避免打印成为瓶颈
+        self.verbose = verbose
+        # 可选的分段占用统计（memory_layout.UsageBuckets），界面聚合显示大布局时由调度器挂上
+        self.usage_view = None
+        # 撤销日志：开启后记录每次对块的修改，回退时逆序撤销，不必每步复制整个块列表
+        self._journal = None
+        # 初始分区来自布局（memory_layout.MemoryLayout），也可直接传入块列表（例如并发模式下某个 arena 的地址段）。
+        # 都不给时使用原始的 7 分区布局；只给 total_size 无法确定分区，直接报错而不是悄悄改用 400
+        if layout is None and blocks is None:
+            if total_size is not None:
+                raise ValueError("只给出 total_size 时无法确定分区，请同时传入 layout 或 blocks")
+            from memory_layout import MemoryLayout
+            layout = MemoryLayout.default()
+        if layout is not None:
+            if total_size is not None and total_size != layout.total_size:
+                raise ValueError(f"total_size {total_size} 与布局大小 {layout.total_size} 不一致")
+            self.total_size = layout.total_size
+            self.unit = layout.unit
+            self.reserved = list(layout.reserved)
+            self.blocks = layout.build_blocks()
+        else:
+            self.total_size = total_size if total_size is not None else max((b.start + b.size for b in blocks), default=0)
+            self.unit = 'MB'
+            self.reserved = []
+            self.blocks = blocks
         # 改为记录上次分配的内存地址，而不是索引
         self.last_alloc_address = 0
 
@@ -32,17 +56,121 @@ class MemoryManager:
         self.current_strategy = None
 
 
-        print("💾 内存管理器初始化完成")
+        self._log("💾 内存管理器初始化完成")
+
+    @property
+    def blocks(self):
+        return self._blocks
+
+    @blocks.setter
+    def blocks(self, blocks):
+        # 外部整体替换块列表（初始化、回退）后，索引需要重建，且不能假设相邻空闲块已合并
+        self._blocks = blocks
+        self._job_index = None
+        self._duplicate_jobs = set()
+        self._fully_merged = False
+        if self.usage_view is not None:
+            self.usage_view.invalidate()
+
+    def start_journal(self):
+        """开始记录撤销日志"""
+        self._journal = []
+
+    def take_journal(self):
+        """结束记录并返回撤销日志"""
+        journal, self._journal = self._journal, None
+        return journal
+
+    def _record_fields(self, block):
+        if self._journal is not None:
+            self._journal.append(('fields', block, block.start, block.size, block.status, block.job_id))
+
+    def _record_all(self):
+        # 整表排序/重建前保存全部块对象及其字段，之前的日志仍引用这些对象
+        if self._journal is not None:
+            blocks = list(self._blocks)
+            self._journal.append(('all', blocks, [(b.start, b.size, b.status, b.job_id) for b in blocks]))
+
+    def undo(self, journal):
+        """按日志逆序撤销一段修改。分段占用统计随之增减，只有撤销整表操作时才需要重建"""
+        blocks = self._blocks
+        view = self.usage_view
+        for record in reversed(journal):
+            kind = record[0]
+            if kind == 'fields':
+                _, block, start, size, status, job_id = record
+                if view is not None:
+                    if block.status == 'used':
+                        view.add(block.start, block.size, -1)
+                    if status == 'used':
+                        view.add(start, size, 1)
+                self._restore(block, start, size, status, job_id)
+            elif kind == 'splice':
+                _, index, removed, inserted = record
+                if view is not None:
+                    for block in blocks[index:index + inserted]:
+                        if block.status == 'used':
+                            view.add(block.start, block.size, -1)
+                    for block in removed:
+                        if block.status == 'used':
+                            view.add(block.start, block.size, 1)
+                blocks[index:index + inserted] = removed
+            else:
+                _, blocks, fields = record
+                for block, (start, size, status, job_id) in zip(blocks, fields):
+                    self._restore(block, start, size, status, job_id)
+                if view is not None:
+                    view.invalidate()
+        self._blocks = blocks
+        self._job_index = None
+        self._duplicate_jobs = set()
+        self._fully_merged = False
+
+    @staticmethod
+    def _restore(block, start, size, status, job_id):
+        block.start = start
+        block.size = size
+        block.status = status
+        block.job_id = job_id
+
+    def _get_job_index(self):
+        """作业ID -> 已用块 的索引，回收时不必线性扫描。同一ID占多块时保留地址最低的那块"""
+        if self._job_index is None:
+            index = {}
+            duplicates = set()
+            for block in self._blocks:
+                if block.status == 'used':
+                    if block.job_id in index:
+                        duplicates.add(block.job_id)
+                    else:
+                        index[block.job_id] = block
+            self._job_index = index
+            self._duplicate_jobs = duplicates
+        return self._job_index
+
+    def _index_used(self, block):
+        index = self._job_index
+        if index is None:
+            return
+        if block.job_id in index:
+            # 同一作业ID重复分配：下次用到时按地址顺序重建
+            self._job_index = None
+        else:
+            index[block.job_id] = block
+
+    def _log(self, *args, **kwargs):
+        if self.verbose:
+            print(*args, **kwargs)
 
     def set_merge_enabled(self, enabled):
         """设置是否启用内存合并功能"""
         self.enable_merge = enabled
-        print(f"🔧 内存合并功能: {'启用' if enabled else '禁用'}")
+        self._log(f"🔧 内存合并功能: {'启用' if enabled else '禁用'}")
 
     def set_compact_enabled(self, enabled):
         """设置是否启用内存紧凑功能"""
         self.enable_compact = enabled
-        print(f"🔧 内存紧凑功能: {'启用' if enabled else '禁用'}")
+        self._log(f"🔧 内存紧凑功能: {'启用' if enabled else '禁用'}")
 
     def allocate(self, job_size, strategy='first_fit', job_id=None):
         # 记录当前策略
@@ -54,11 +182,11 @@ class MemoryManager:
 
         # 只有启用紧凑功能时才执行紧凑操作
         if self.enable_compact:
-            print("⚠️ 分配失败，尝试执行紧凑...")
+            self._log("⚠️ 分配失败，尝试执行紧凑...")
             self.compact()
             return self._allocate_once(job_size, strategy, job_id)
         else:
-            print("❌ 分配失败，紧凑功能已禁用")
+            self._log("❌ 分配失败，紧凑功能已禁用")
             return None
 
     def _allocate_once(self, job_size, strategy, job_id):
@@ -90,7 +218,7 @@ class MemoryManager:
                 addr = self.split_block(block, size, job_id)
                 if addr is not None:
                     self.last_alloc_address = addr  # 更新上次分配地址
-                    print(f"🎯 Next Fit: 从地址 {self.last_alloc_address}MB 开始分配 {size}MB")
+                    self._log(f"🎯 Next Fit: 从地址 {self.last_alloc_address}MB 开始分配 {size}MB")
                     return addr
 
         # 如果从上次位置到末尾没找到合适的块，从头开始搜索到上次位置
@@ -101,7 +229,7 @@ class MemoryManager:
                 addr = self.split_block(block, size, job_id)
                 if addr is not None:
                     self.last_alloc_address = addr  # 更新上次分配地址
-                    print(f"🎯 Next Fit: 环绕到头部，从地址 {self.last_alloc_address}MB 开始分配 {size}MB")
+                    self._log(f"🎯 Next Fit: 环绕到头部，从地址 {self.last_alloc_address}MB 开始分配 {size}MB")
                     return addr
 
         return None
@@ -121,61 +249,101 @@ class MemoryManager:
         return self.split_block(worst, size, job_id)
 
     def split_block(self, block, size, job_id):
+        if self.usage_view is not None:
+            self.usage_view.add(block.start, size, 1)
         if block.size == size:
+            self._record_fields(block)
             block.status = 'used'
             block.job_id = job_id
+            self._index_used(block)
             return block.start
         else:
             new_used = MemoryBlock(block.start, size, 'used', job_id)
             new_free = MemoryBlock(block.start + size, block.size - size, 'free')
             index = self.blocks.index(block)
-            self.blocks.pop(index)
-            self.blocks.insert(index, new_free)
-            self.blocks.insert(index, new_used)
+            if self._journal is not None:
+                self._journal.append(('splice', index, [block], 2))
+            self.blocks[index:index + 1] = [new_used, new_free]
+            self._index_used(new_used)
             return new_used.start
 
     def recycle(self, job_id):
-        recycled_block = None
-        for block in self.blocks:
-            if block.status == 'used' and block.job_id == job_id:
-                block.status = 'free'
-                block.job_id = None
-                recycled_block = block
-                print(f"🗑 释放作业 {job_id} 占用的内存块: 地址 {block.start}MB, 大小 {block.size}MB")
-                break
+        recycled_block = self._get_job_index().pop(job_id, None)
+        if job_id in self._duplicate_jobs:
+            self._job_index = None
+        if recycled_block is not None:
+            if self.usage_view is not None:
+                self.usage_view.add(recycled_block.start, recycled_block.size, -1)
+            self._record_fields(recycled_block)
+            recycled_block.status = 'free'
+            recycled_block.job_id = None
+            if self.verbose:
+                self._log(f"🗑 释放作业 {job_id} 占用的内存块: 地址 {recycled_block.start}MB, 大小 {recycled_block.size}MB")
 
         # 只有启用合并功能时才执行合并操作
         if self.enable_merge:
             # 在合并前保存当前的last_alloc_address，确保它仍然有效
             old_address = self.last_alloc_address
-            merged_block = self.merge_free_blocks()
+            if self._fully_merged and recycled_block is not None:
+                # 其余位置没有相邻的空闲块，只需和左右邻居合并，结果与整表合并相同
+                self._merge_neighbours(recycled_block)
+            else:
+                self.merge_free_blocks()
             # 合并后检查last_alloc_address是否仍然有效
             self.validate_last_alloc_address(old_address)
         else:
-            print("ℹ️ 内存合并功能已禁用，跳过合并操作")
+            self._fully_merged = False
+            self._log("ℹ️ 内存合并功能已禁用，跳过合并操作")
+
+    def _merge_neighbours(self, block):
+        """把刚释放的块与左右相邻的空闲块合并"""
+        self._log("🔗 合并与释放块相邻的空闲内存块...")
+        blocks = self._blocks
+        i = blocks.index(block)
+        if i + 1 < len(blocks):
+            next_block = blocks[i + 1]
+            if next_block.status == 'free' and block.start + block.size == next_block.start:
+                if self.verbose:
+                    self._log(f"  合并: [{block.start}MB, {block.size}MB] + [{next_block.start}MB, {next_block.size}MB]")
+                self._record_fields(block)
+                block.size += next_block.size
+                if self._journal is not None:
+                    self._journal.append(('splice', i + 1, [next_block], 0))
+                del blocks[i + 1]
+        if i > 0:
+            prev_block = blocks[i - 1]
+            if prev_block.status == 'free' and prev_block.start + prev_block.size == block.start:
+                if self.verbose:
+                    self._log(f"  合并: [{prev_block.start}MB, {prev_block.size}MB] + [{block.start}MB, {block.size}MB]")
+                self._record_fields(prev_block)
+                prev_block.size += block.size
+                if self._journal is not None:
+                    self._journal.append(('splice', i, [block], 0))
+                del blocks[i]
 
     def validate_last_alloc_address(self, old_address):
         """
         验证并更新last_alloc_address，确保它指向一个有效的位置
         """
-        # 找到大于等于old_address的第一个块的起始地址
-        valid_addresses = [block.start for block in self.blocks if block.start >= old_address]
+        # 找到大于等于old_address的第一个块的起始地址（块按地址有序，二分查找即可）
+        i = bisect_left(self.blocks, old_address, key=lambda b: b.start)
 
-        if valid_addresses:
+        if i < len(self.blocks):
             # 如果有大于等于原地址的块，使用最小的那个
-            self.last_alloc_address = min(valid_addresses)
+            self.last_alloc_address = self.blocks[i].start
         else:
             # 如果没有，说明原地址超过了所有块，重置为0（从头开始）
             self.last_alloc_address = 0
 
-        if self.current_strategy == 'next_fit':  # 只有next_fit才输出地址更新信息
-            print(f"🔄 Next Fit地址更新: {old_address}MB -> {self.last_alloc_address}MB")
+        if self.verbose and self.current_strategy == 'next_fit':  # 只有next_fit才输出地址更新信息
+            self._log(f"🔄 Next Fit地址更新: {old_address}MB -> {self.last_alloc_address}MB")
 
     def merge_free_blocks(self):
         """
         合并相邻的空闲内存块，返回是否发生了合并
         """
-        print("🔗 开始合并相邻的空闲内存块...")
+        self._log("🔗 开始合并相邻的空闲内存块...")
+        self._record_all()
 
         # 按起始地址排序
         self.blocks.sort(key=lambda b: b.start)
@@ -193,44 +361,71 @@ class MemoryManager:
                        self.blocks[i + 1].status == 'free' and
                        current.start + current.size == self.blocks[i + 1].start):
                     next_block = self.blocks[i + 1]
-                    print(
+                    self._log(
                         f"  合并: [{current.start}MB, {current.size}MB] + [{next_block.start}MB, {next_block.size}MB]")
                     current.size += next_block.size
                     has_merged = True
                     i += 1
                 if has_merged:
-                    print(f"  合并结果: [{current.start}MB, {current.size}MB]")
+                    self._log(f"  合并结果: [{current.start}MB, {current.size}MB]")
 
             merged.append(current)
             i += 1
 
-        self.blocks = merged
+        # 直接替换内部列表：已用块对象不变，作业索引仍然有效
+        self._blocks = merged
+        self._fully_merged = True
         if has_merged:
-            print("✅ 内存块合并完成")
+            self._log("✅ 内存块合并完成")
         else:
-            print("ℹ️ 没有相邻的空闲块需要合并")
+            self._log("ℹ️ 没有相邻的空闲块需要合并")
 
         return has_merged
 
+    def spans(self):
+        """当前块覆盖的连续地址区段 [[起址, 终址]]，即紧凑后单个作业可能占用的最大范围。
+        分割、合并、紧凑都不改变块覆盖的地址，区段在整个模拟过程中保持不变"""
+        spans = []
+        for block in sorted(self.blocks, key=lambda b: b.start):
+            if spans and spans[-1][1] == block.start:
+                spans[-1][1] = block.start + block.size
+            else:
+                spans.append([block.start, block.start + block.size])
+        return spans
+
     def compact(self):
-        new_blocks = []
-        current_start = 0
+        """把已用块依次搬到各连续区段的低地址端。
+        区段由当前块覆盖的地址合并得到，分区之间的空洞和保留区不会被占用"""
+        self._record_all()
+        self.blocks.sort(key=lambda b: b.start)
+        spans = self.spans()
 
-        # 只紧凑原始 block 中的 used 区域
+        new_blocks = []
+        span_index = 0
+        current_start = spans[0][0] if spans else 0
         for block in self.blocks:
-            if block.status == 'used':
-                new_blocks.append(MemoryBlock(current_start, block.size, 'used', block.job_id))
-                current_start += block.size
-
-        # 计算剩下的空闲大小（但最多不超过原始块总和）
-        # 限制总内存不能超过已有 block 的和（最多200MB）
-        defined_total = sum(b.size for b in self.blocks)
-        remaining = defined_total - current_start
-
-        if remaining > 0:
-            new_blocks.append(MemoryBlock(current_start, remaining, 'free'))
+            if block.status != 'used':
+                continue
+            # 当前区段放不下时，剩余部分作为空闲块留下，转到下一个区段
+            while current_start + block.size > spans[span_index][1]:
+                span_end = spans[span_index][1]
+                if span_end > current_start:
+                    new_blocks.append(MemoryBlock(current_start, span_end - current_start, 'free'))
+                span_index += 1
+                current_start = spans[span_index][0]
+            new_blocks.append(MemoryBlock(current_start, block.size, 'used', block.job_id))
+            current_start += block.size
+
+        # 收尾：当前区段的剩余部分和后面整个区段都是空闲块
+        for i in range(span_index, len(spans)):
+            if i > span_index:
+                current_start = spans[i][0]
+            if spans[i][1] > current_start:
+                new_blocks.append(MemoryBlock(current_start, spans[i][1] - current_start, 'free'))
 
         self.blocks = new_blocks
+        # 紧凑结果中各区段至多一个空闲尾块，区段互不相邻，不存在相邻空闲块
+        self._fully_merged = True
         # 紧凑后重置next_fit的起始位置
-        self.last_alloc_address = 0
-        print("🧹 内存整理完成（紧凑操作）")
\ No newline at end of file
+        self.last_alloc_address = spans[0][0] if spans else 0
+        self._log("🧹 内存整理完成（紧凑操作）")
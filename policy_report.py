@@ -0,0 +1,45 @@
+# policy_report.py
+# 比较各准入策略：对同一批作业分别运行，输出完工时间、平均等待时间和内存-时间利用率。
+# 用法：python policy_report.py [作业文件] [--strategy best_fit] [--layout memory_layout.json]
+
+import argparse
+
+from memory_layout import MemoryLayout
+from result_cache import ResultCache, cached_run, load_jobs
+from simulator import ADMISSION_POLICIES
+
+
+def compare_policies(job_file, strategy='first_fit', enable_merge=True, enable_compact=True,
+                     layout=None, cache=None):
+    """返回每个准入策略的指标，以及完成作业最多、完工时间最短的推荐策略"""
+    results = []
+    for admission in ADMISSION_POLICIES:
+        metrics, _, _ = cached_run(load_jobs(job_file), strategy, enable_merge, enable_compact,
+                                   cache=cache, layout=layout, admission=admission)
+        results.append(metrics)
+    best = min(results, key=lambda m: (-m['jobs_finished'], m['makespan'], m['mean_wait']))
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="准入策略对比")
+    parser.add_argument("job_file", nargs="?", default="job_data.json")
+    parser.add_argument("--strategy", default="first_fit",
+                        choices=['first_fit', 'next_fit', 'best_fit', 'worst_fit'])
+    parser.add_argument("--no-merge", action="store_true", help="禁用内存合并")
+    parser.add_argument("--no-compact", action="store_true", help="禁用内存紧凑")
+    parser.add_argument("--layout", help="内存布局文件，缺省为原始的 7 分区布局")
+    args = parser.parse_args()
+
+    layout = MemoryLayout.from_file(args.layout) if args.layout else None
+    results, best = compare_policies(args.job_file, args.strategy, not args.no_merge,
+                                     not args.no_compact, layout, ResultCache())
+    print(f"{'准入策略':<14} {'完成作业':>8} {'完工时间':>8} {'平均等待':>10} {'内存-时间利用率':>14}")
+    for m in results:
+        print(f"{m['admission']:<14} {m['jobs_finished']:>5}/{m['jobs_total']:<3} {m['makespan']:>8} "
+              f"{m['mean_wait']:>10.2f} {m['mean_utilization']:>14.1%}")
+    print(f"🏆 推荐准入策略: {best['admission']}（完成作业最多，其次完工时间最短，再次平均等待最短）")
+
+
+if __name__ == "__main__":
+    main()
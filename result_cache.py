@@ -0,0 +1,177 @@
+# result_cache.py
+# 模拟结果缓存：以 作业内容 + 策略 + 准入策略 + 合并/紧凑开关 + 内存布局 + 引擎版本 的哈希为键，
+# 把最终指标（以及可选的完整过程记录）存到本地磁盘，按最近使用时间做容量淘汰。
+# 用法：python result_cache.py [作业文件] [--strategy best_fit] [--no-merge] [--no-compact] [--record]
+#       [--layout memory_layout.json] [--admission easy_backfill]
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from job import Job
+from memory_layout import MemoryLayout
+from simulator import ADMISSION_POLICIES, ENGINE_VERSION, run_simulation
+
+DEFAULT_CACHE_DIR = ".sim_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def make_key(jobs, strategy, enable_merge, enable_compact, layout=None, admission='greedy'):
+    """计算缓存键。作业顺序会影响同一到达时间内的调度顺序，因此按原顺序参与哈希。
+    只支持按名称给出的准入策略：可调用对象的行为无法从名称判断，缓存结果可能对应旧的实现"""
+    if not isinstance(admission, str):
+        raise TypeError(f"结果缓存只支持内置准入策略 {ADMISSION_POLICIES}，"
+                        f"自定义的 {admission!r} 请直接调用 simulator.run_simulation")
+    payload = {
+        'engine_version': ENGINE_VERSION,
+        'jobs': [[str(job.job_id), job.size, job.arrival_time, job.run_time] for job in jobs],
+        'strategy': strategy,
+        'admission': admission,
+        'enable_merge': bool(enable_merge),
+        'enable_compact': bool(enable_compact),
+        'layout': (layout if layout is not None else MemoryLayout.default()).fingerprint(),
+    }
+    data = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _metrics_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _recording_path(self, key):
+        return os.path.join(self.directory, f"{key}.rec.json.gz")
+
+    def get(self, key, with_recording=False):
+        """命中返回 {'metrics': ..., 'recording': ...}，未命中返回 None"""
+        metrics_path = self._metrics_path(key)
+        recording_path = self._recording_path(key)
+        if with_recording and not os.path.exists(recording_path):
+            return None
+        try:
+            with open(metrics_path, "r", encoding="utf-8") as f:
+                metrics = json.load(f)
+            recording = None
+            if with_recording:
+                with gzip.open(recording_path, "rt", encoding="utf-8") as f:
+                    recording = json.load(f)
+        except (OSError, ValueError):
+            # 文件缺失或损坏（例如被并发淘汰）时当作未命中
+            return None
+
+        # 更新修改时间作为“最近使用”标记，淘汰时据此排序
+        for path in (metrics_path, recording_path):
+            if os.path.exists(path):
+                os.utime(path)
+        return {'metrics': metrics, 'recording': recording}
+
+    def put(self, key, metrics, recording=None):
+        self._write_atomic(self._metrics_path(key),
+                           json.dumps(metrics, ensure_ascii=False).encode('utf-8'))
+        if recording is not None:
+            data = json.dumps(recording, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            self._write_atomic(self._recording_path(key), gzip.compress(data))
+        self.evict()
+
+    def _write_atomic(self, path, data):
+        # 先写临时文件再改名，避免读到写了一半的结果
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def entries(self):
+        """缓存中的文件列表 [(修改时间, 大小, 路径)]，最久未用的在前"""
+        result = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, path))
+        result.sort()
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """总大小超过上限时，从最久未使用的文件开始删除"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+
+def cached_run(jobs, strategy='first_fit', enable_merge=True, enable_compact=True,
+               cache=None, record=False, layout=None, admission='greedy'):
+    """带缓存的 run_simulation，返回 (指标, 过程记录或 None, 是否命中)"""
+    cache = cache if cache is not None else ResultCache()
+    key = make_key(jobs, strategy, enable_merge, enable_compact, layout, admission)
+    hit = cache.get(key, with_recording=record)
+    if hit is not None:
+        return hit['metrics'], hit['recording'], True
+
+    metrics, recording = run_simulation(jobs, strategy, enable_merge, enable_compact, record=record,
+                                        layout=layout, admission=admission)
+    cache.put(key, metrics, recording)
+    return metrics, recording, False
+
+
+def load_jobs(path):
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return [Job(j["job_id"], j["size"], j["arrival_time"], j["run_time"]) for j in raw]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="带结果缓存的无界面模拟")
+    parser.add_argument("job_file", nargs="?", default="job_data.json")
+    parser.add_argument("--strategy", default="first_fit",
+                        choices=['first_fit', 'next_fit', 'best_fit', 'worst_fit'])
+    parser.add_argument("--no-merge", action="store_true", help="禁用内存合并")
+    parser.add_argument("--no-compact", action="store_true", help="禁用内存紧凑")
+    parser.add_argument("--record", action="store_true", help="同时缓存完整过程记录")
+    parser.add_argument("--layout", help="内存布局文件，缺省为原始的 7 分区布局")
+    parser.add_argument("--admission", default="greedy", choices=ADMISSION_POLICIES)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024)
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache_dir, int(args.max_mb * 1024 * 1024))
+    layout = MemoryLayout.from_file(args.layout) if args.layout else None
+    metrics, _, hit = cached_run(load_jobs(args.job_file), args.strategy,
+                                 not args.no_merge, not args.no_compact, cache, args.record, layout,
+                                 args.admission)
+    print(f"{'✅ 命中缓存' if hit else '🧮 重新计算'}")
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# simulation_worker.py
+# 后台调度线程：在独立线程中推进 Simulator，界面线程通过 snapshot() 按帧率取最新状态。
+
+import threading
+from contextlib import contextmanager
+
+
+class SimulationWorker:
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._running = False
+        self._stopped = False
+        self._interval = 1.0  # 秒；0 表示不限速
+        # 界面线程需要锁时置位，极速循环看到后主动让出锁，避免界面被饿死
+        self._yield_requested = False
+        # 每次状态变化递增，界面据此判断是否需要重绘
+        self.version = 0
+        self._thread = threading.Thread(target=self._run, name="simulation-worker", daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def _command(self):
+        self._yield_requested = True
+        with self._wakeup:
+            self._yield_requested = False
+            yield
+            self._wakeup.notify()
+
+    def _run(self):
+        with self._wakeup:
+            while not self._stopped:
+                if not self._running:
+                    self._wakeup.wait()
+                    continue
+
+                self._step_locked()
+                if self._interval > 0:
+                    # wait 会释放锁，暂停/单步/退出时可立即唤醒
+                    self._wakeup.wait(self._interval)
+                elif self._yield_requested:
+                    self._wakeup.wait(0.001)
+
+    def _step_locked(self):
+        if self.simulator.is_finished() or self.simulator.is_stuck():
+            self._running = False
+            return
+        self.simulator.step()
+        self.version += 1
+        if self.simulator.is_finished() or self.simulator.is_stuck():
+            self._running = False
+
+    def set_interval(self, seconds):
+        """设置每步间隔，0 为极速（不限速）模式"""
+        with self._command():
+            self._interval = seconds
+            # 极速模式下关闭日志，打印会远慢于模拟本身
+            self.simulator.set_verbose(seconds > 0)
+
+    def resume(self):
+        with self._command():
+            # 用户可能在卡住后改了设置，恢复运行时至少再尝试一拍
+            self.simulator.clear_stuck()
+            self._running = True
+
+    def pause(self):
+        # 先清标志，极速循环在下一步即会停下并释放锁
+        self._running = False
+        with self._command():
+            self._running = False
+
+    def is_running(self):
+        return self._running
+
+    def step_once(self):
+        self._running = False
+        with self._command():
+            self._running = False
+            if not self.simulator.is_finished():
+                self.simulator.step()
+                self.version += 1
+
+    def step_back(self):
+        """回退一步，成功返回 True"""
+        self._running = False
+        with self._command():
+            self._running = False
+            ok = self.simulator.step_back()
+            if ok:
+                self.version += 1
+            return ok
+
+    def add_job(self, job):
+        with self._command():
+            self.simulator.add_job(job)
+            self.version += 1
+
+    def call(self, func, *args):
+        """在持有调度锁的情况下执行 func(simulator, *args)，用于修改模型参数"""
+        with self._command():
+            result = func(self.simulator, *args)
+            self.simulator.clear_stuck()
+            self.version += 1
+            return result
+
+    def snapshot(self, max_blocks=None):
+        with self._command():
+            snap = self.simulator.snapshot(max_blocks)
+            snap['version'] = self.version
+            snap['running'] = self._running
+            return snap
+
+    def stop(self):
+        self._running = False
+        with self._command():
+            self._stopped = True
+        self._thread.join()
@@ -0,0 +1,341 @@
+# simulator.py
+# 与界面无关的调度核心：原 MainWindow.step() 的逻辑搬到这里，
+# 以便在后台线程中以任意速度运行，界面只负责按帧率采样显示。
+
+from collections import deque
+
+from job import Job
+from memory_layout import UsageBuckets
+from memory_model import MemoryManager
+
+# 调度/分配逻辑的版本号，改变模拟结果的修改都要递增，结果缓存依赖它失效
+ENGINE_VERSION = 5
+
+# 准入策略：
+#   greedy        每拍按顺序把已到达的等待作业各尝试一次，放不下就跳过（原有行为）
+#   fifo          严格先进先出，队首放不下时后面的作业也不准入（队头阻塞）
+#   easy_backfill EASY 回填：为最早被阻塞的作业预留内存，较小的作业只有在预留时间前
+#                 结束、或只占用预留之外的富余内存时才能先进入
+ADMISSION_POLICIES = ['greedy', 'fifo', 'easy_backfill']
+
+# 回退历史最多保留的块记录条数（各步撤销日志长度之和）。
+# 紧凑等整表操作一步就会记录全部块，大布局下据此少保留几步，而不是按步数占满内存
+HISTORY_BLOCK_BUDGET = 2_000_000
+
+
+def job_snapshot(job):
+    """作业状态转为普通字典，供界面显示"""
+    return {
+        'job_id': job.job_id,
+        'size': job.size,
+        'arrival_time': job.arrival_time,
+        'remaining_time': job.remaining_time if job.status != 'finished' else 0,
+        'status': job.status,
+        'start_time': job.start_time,
+        'finish_time': job.finish_time
+    }
+
+
+class Simulator:
+    def __init__(self, manager, jobs, strategy='first_fit', verbose=True, history_limit=1000,
+                 admission='greedy'):
+        self.manager = manager
+        self.jobs = jobs
+        self.strategy = strategy
+        # 准入策略名，或可调用对象 admission(simulator, waiting_jobs)
+        self.admission = admission
+        # 单个作业最多只能占满一个连续区段（紧凑也不会跨越分区间的空洞和保留区），
+        # 区段在模拟过程中不变，初始化时算一次即可
+        self._capacity = max((end - start for start, end in manager.spans()), default=0)
+        self.verbose = verbose
+        self.current_time = 0
+        # 最近一次准入尝试所在的时刻；之后若有外部修改则清空，用于判断是否卡死
+        self._attempted_at = None
+        # 只保留最近 history_limit 步，且块记录总数不超过 HISTORY_BLOCK_BUDGET，防止内存耗尽
+        self.history = deque()
+        self.history_limit = history_limit
+        self._history_cost = 0
+        # 界面聚合显示用的分段占用统计，第一次按段取快照时创建
+        self._usage_view = None
+        self.sort_jobs()
+
+    def _log(self, *args, **kwargs):
+        if self.verbose:
+            print(*args, **kwargs)
+
+    def set_verbose(self, verbose):
+        """同时切换调度器和内存管理器的日志输出"""
+        self.verbose = verbose
+        self.manager.verbose = verbose
+
+    def is_finished(self):
+        return all(job.status == 'finished' for job in self.jobs)
+
+    def capacity(self):
+        """单个作业可申请的最大内存：最大连续区段的大小，超过它的作业即使紧凑后也装不下"""
+        return self._capacity
+
+    def is_stuck(self):
+        """没有作业在运行，剩下的作业都已到达并在本拍尝试过准入却仍在等待。
+        此时内存不会再有任何变化（没有释放、也没有新作业到达），继续推进只会空转"""
+        if self.is_finished() or self._attempted_at != self.current_time:
+            return False
+        return all(job.status == 'finished' or
+                   (job.status == 'waiting' and job.arrival_time <= self.current_time)
+                   for job in self.jobs)
+
+    def clear_stuck(self):
+        """追加作业、切换策略或合并/紧凑开关后调用，下一拍重新尝试准入"""
+        self._attempted_at = None
+
+    def add_job(self, job):
+        self.jobs.append(job)
+        self.clear_stuck()
+        self.sort_jobs()
+
+    def sort_jobs(self):
+        """按 运行中 / 等待 / 完成 + 到达时间 排序，决定下一拍的调度顺序"""
+        status_order = {'running': 0, 'waiting': 1, 'finished': 2}
+        self.jobs.sort(key=lambda j: (status_order.get(j.status, 3), j.arrival_time))
+
+    def step(self):
+        # 保存回退信息：作业可变字段的元组、当前时间，以及本步对内存块的撤销日志。
+        # 块只记录被修改的部分，大布局下每步不必复制整个块列表
+        record = self.history_limit != 0
+        if record:
+            state = {
+                "jobs": [(job, job.status, job.remaining_time, job.start_time, job.finish_time)
+                         for job in self.jobs],
+                "last_alloc_address": self.manager.last_alloc_address,
+                "current_time": self.current_time
+            }
+            self.manager.start_journal()
+
+        try:
+            self._advance()
+        finally:
+            if record:
+                state["journal"] = self.manager.take_journal()
+        if record:
+            self._push_history(state)
+
+    def _push_history(self, state):
+        cost = len(state["jobs"])
+        for entry in state["journal"]:
+            cost += len(entry[1]) if entry[0] == 'all' else 1
+        state["cost"] = cost
+        self.history.append(state)
+        self._history_cost += cost
+        limit = self.history_limit
+        while len(self.history) > 1 and ((limit is not None and len(self.history) > limit) or
+                                         self._history_cost > HISTORY_BLOCK_BUDGET):
+            self._history_cost -= self.history.popleft()["cost"]
+
+    def _advance(self):
+        """推进一拍：运行中的作业计时、回收内存，再按准入策略装入等待作业"""
+        self.current_time += 1
+        self._log(f"\n⏱ 当前时间: {self.current_time}")
+
+        # 先推进运行中的作业并回收内存，再按准入策略装入等待作业。
+        # 作业表按 运行中 在前排序，这与原先单次遍历的处理顺序一致
+        waiting = []
+        for job in self.jobs:
+            if job.status == 'running':
+                job.remaining_time -= 1
+                self._log(f"▶️ 作业 {job.job_id} 运行中，剩余时间: {job.remaining_time}s")
+                if job.remaining_time <= 0:
+                    job.status = 'finished'
+                    job.finish_time = self.current_time
+                    self.manager.recycle(job.job_id)
+                    self._log(f"✅ 作业 {job.job_id} 已完成并释放内存")
+            elif job.status == 'waiting' and job.arrival_time <= self.current_time:
+                waiting.append(job)
+
+        if waiting:
+            self._admit(waiting)
+        self._attempted_at = self.current_time
+
+        # 原来由界面刷新作业表时排序，这里保留同样的顺序语义
+        self.sort_jobs()
+
+    def _admit(self, waiting):
+        if callable(self.admission):
+            self.admission(self, waiting)
+        elif self.admission == 'greedy':
+            self.admit_greedy(waiting)
+        elif self.admission == 'fifo':
+            self.admit_fifo(waiting)
+        elif self.admission == 'easy_backfill':
+            self.admit_easy_backfill(waiting)
+        else:
+            raise ValueError(f"未知的准入策略: {self.admission}")
+
+    def try_start(self, job):
+        """尝试为作业分配内存并装入，成功返回 True"""
+        addr = self.manager.allocate(job.size, strategy=self.strategy, job_id=job.job_id)
+        if addr is None:
+            self._log(f"🕓 作业 {job.job_id} 等待中，内存不足")
+            return False
+        job.status = 'running'
+        job.start_time = self.current_time
+        self._log(f"✅ 作业 {job.job_id} 进入内存，起始地址: {addr}MB")
+        return True
+
+    def admit_greedy(self, waiting):
+        for job in waiting:
+            self.try_start(job)
+
+    def _queue(self, waiting):
+        """按到达时间排队；永远装不下的作业不参与排队，避免把整个队列永久堵死"""
+        capacity = self.capacity()
+        return sorted((job for job in waiting if job.size <= capacity), key=lambda j: j.arrival_time)
+
+    def admit_fifo(self, waiting):
+        for job in self._queue(waiting):
+            if not self.try_start(job):
+                self._log(f"⛔ 队首作业 {job.job_id} 阻塞，后续作业不准入")
+                break
+
+    def admit_easy_backfill(self, waiting):
+        queue = self._queue(waiting)
+        # 先按先进先出装入，直到遇到第一个放不下的作业
+        while queue and self.try_start(queue[0]):
+            queue.pop(0)
+        if not queue:
+            return
+
+        head = queue.pop(0)
+        shadow_time, extra = self.reservation(head)
+        self._log(f"📌 为作业 {head.job_id} 预留 {head.size}MB，预计时间 {shadow_time}s")
+        for job in queue:
+            ends_before = self.current_time + job.run_time <= shadow_time
+            if not ends_before and job.size > extra:
+                continue
+            if self.try_start(job):
+                self._log(f"↪️ 作业 {job.job_id} 回填进入内存")
+                if not ends_before:
+                    extra -= job.size
+
+    def reservation(self, head):
+        """估算队首作业最早可装入的时间，以及届时装入后剩余的内存。
+        按运行中作业的结束时间依次累加释放的内存；不考虑碎片，依赖紧凑保证空闲总量可用"""
+        free = sum(b.size for b in self.manager.blocks if b.status == 'free')
+        releases = sorted((job.remaining_time, job.size) for job in self.jobs if job.status == 'running')
+        shadow_time = self.current_time
+        for remaining_time, size in releases:
+            if free >= head.size:
+                break
+            free += size
+            shadow_time = self.current_time + remaining_time
+        return shadow_time, free - head.size
+
+    def step_back(self):
+        """回退一步，成功返回 True"""
+        if not self.history:
+            return False
+
+        last_state = self.history.pop()
+        self._history_cost -= last_state["cost"]
+        self.jobs = []
+        for job, status, remaining_time, start_time, finish_time in last_state["jobs"]:
+            job.status = status
+            job.remaining_time = remaining_time
+            job.start_time = start_time
+            job.finish_time = finish_time
+            self.jobs.append(job)
+        self.manager.undo(last_state["journal"])
+        self.manager.last_alloc_address = last_state["last_alloc_address"]
+        self.current_time = last_state["current_time"]
+        self.clear_stuck()
+        return True
+
+    def snapshot(self, max_blocks=None):
+        """生成当前状态的只读副本，供界面绘制。
+        块数超过 max_blocks 时按地址聚合成 max_blocks 段，避免大布局下逐块复制和绘制"""
+        manager = self.manager
+        if max_blocks is not None and len(manager.blocks) > max_blocks:
+            view = self._get_usage_view(max_blocks)
+            blocks = view.segments()
+            used = view.used_total
+            total = view.covered_total
+        else:
+            blocks = [{
+                'start': block.start,
+                'size': block.size,
+                'type': 'free' if block.status == 'free' else 'used',
+                'job_id': block.job_id
+            } for block in manager.blocks]
+            used = 0
+            total = 0
+            for block in manager.blocks:
+                total += block.size
+                if block.status == 'used':
+                    used += block.size
+        return {
+            'current_time': self.current_time,
+            'total_size': manager.total_size,
+            'unit': manager.unit,
+            'reserved': list(manager.reserved),
+            'used': used,
+            'total': total,
+            'blocks': blocks,
+            'jobs': [job_snapshot(job) for job in self.jobs],
+            'finished': self.is_finished()
+        }
+
+
+    def _get_usage_view(self, buckets):
+        """分段占用统计挂在内存管理器上随分配/回收增量更新，只在紧凑、回退后整体重建"""
+        manager = self.manager
+        view = self._usage_view
+        if view is None or view.buckets != buckets or view.total_size != manager.total_size:
+            view = self._usage_view = UsageBuckets(manager.total_size, buckets)
+            manager.usage_view = view
+        if view.dirty:
+            view.rebuild(manager.blocks)
+        return view
+
+
+def run_simulation(jobs, strategy='first_fit', enable_merge=True, enable_compact=True,
+                   record=False, max_ticks=None, layout=None, admission='greedy'):
+    """无界面地把作业跑到结束，返回 (指标, 每步快照列表或 None)。
+    按作业的输入字段重新构造 Job，调用方传入的作业列表不会被排序或修改"""
+    jobs = [Job(job.job_id, job.size, job.arrival_time, job.run_time) for job in jobs]
+    manager = MemoryManager(enable_merge=enable_merge, enable_compact=enable_compact, verbose=False,
+                            layout=layout)
+    simulator = Simulator(manager, jobs, strategy=strategy, verbose=False, history_limit=0,
+                          admission=admission)
+    recording = [simulator.snapshot()] if record else None
+    used_time = 0  # 内存占用 × 时间的累计，用于计算平均利用率
+    total = sum(b.size for b in manager.blocks)
+
+    while not simulator.is_finished():
+        if max_ticks is not None and simulator.current_time >= max_ticks:
+            break
+        if simulator.is_stuck():
+            break
+        simulator.step()
+        used_time += sum(b.size for b in manager.blocks if b.status == 'used')
+        if record:
+            recording.append(simulator.snapshot())
+
+    finished = [job for job in simulator.jobs if job.status == 'finished']
+    turnaround = [job.finish_time - job.arrival_time for job in finished]
+    waits = [job.start_time - job.arrival_time for job in simulator.jobs if job.start_time is not None]
+    # 完工时间：最后一个作业结束的时刻
+    makespan = max((job.finish_time for job in finished), default=0)
+    metrics = {
+        'ticks': simulator.current_time,
+        'admission': admission if isinstance(admission, str) else getattr(admission, '__name__', 'custom'),
+        'jobs_total': len(simulator.jobs),
+        'jobs_finished': len(finished),
+        # 因内存不足（例如碎片且未启用紧凑）始终没能装入的作业
+        'jobs_unstarted': [str(job.job_id) for job in simulator.jobs if job.start_time is None],
+        'stalled': simulator.is_stuck(),
+        'makespan': makespan,
+        'mean_wait': sum(waits) / len(waits) if waits else 0,
+        'mean_turnaround': sum(turnaround) / len(turnaround) if turnaround else 0,
+        'mean_utilization': used_time / (total * simulator.current_time) if total and simulator.current_time else 0,
+        'finish_times': {str(job.job_id): job.finish_time for job in simulator.jobs},
+    }
+    return metrics, recording
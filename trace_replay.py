@@ -0,0 +1,319 @@
+# trace_replay.py
+# 分配轨迹回放：不经过按时间片推进的调度器，直接用带时间戳的 分配/释放 事件流
+# 驱动 MemoryManager.allocate / recycle，比较各分配策略的碎片率和延迟。
+#
+# 文本格式（每行一个事件，# 开头为注释）：
+#     <时间戳> a <id> <大小>      分配
+#     <时间戳> f <id>             释放
+# 二进制格式：文件头 BINARY_MAGIC，之后是定长记录 RECORD（时间戳 double、操作 a/f、id、大小）。
+#
+# 用法：
+#     python trace_replay.py replay trace.txt [--capacity 419430400] [--unit 1] [--strategies first_fit best_fit]
+#                                             [--compact]
+# 真实的 malloc 无法移动存活的分配，回放默认不做紧凑；--compact 只用于和课程模型对照，
+# 开启后分配失败会被紧凑掩盖，报告中会注明。
+#     python trace_replay.py convert ltrace.log trace.bin --binary
+# convert 支持 ltrace（malloc/calloc/realloc/free，可带 -tt 时间戳、-e 的 "库->" 前缀）和 glibc mtrace 输出，
+# 并报告被跳过的行和调用数量。
+
+import argparse
+import re
+import struct
+import sys
+import time
+
+from memory_model import MemoryBlock, MemoryManager
+
+STRATEGIES = ['first_fit', 'next_fit', 'best_fit', 'worst_fit']
+
+BINARY_MAGIC = b"MTRACE1\n"
+RECORD = struct.Struct("<dcQQ")
+READ_CHUNK = RECORD.size * 65536
+
+
+def read_events(path):
+    """流式读取事件，产出 (时间戳, 'a'/'f', id, 大小)；按文件头自动识别文本或二进制"""
+    with open(path, "rb") as f:
+        head = f.read(len(BINARY_MAGIC))
+        if head == BINARY_MAGIC:
+            yield from _read_binary(f)
+            return
+
+    with open(path, "r", encoding="utf-8", buffering=1024 * 1024) as f:
+        for line_no, line in enumerate(f, 1):
+            parts = line.split()
+            if not parts or parts[0].startswith('#'):
+                continue
+            op = parts[1]
+            if op == 'a':
+                yield float(parts[0]), 'a', int(parts[2]), int(parts[3])
+            elif op == 'f':
+                yield float(parts[0]), 'f', int(parts[2]), 0
+            else:
+                raise ValueError(f"{path}:{line_no}: 未知事件类型 {op!r}")
+
+
+def _read_binary(f):
+    rest = b""
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            break
+        data = rest + chunk
+        usable = len(data) - len(data) % RECORD.size
+        for timestamp, op, event_id, size in RECORD.iter_unpack(data[:usable]):
+            yield timestamp, op.decode('ascii'), event_id, size
+        rest = data[usable:]
+    if rest:
+        raise ValueError("二进制轨迹文件末尾记录不完整")
+
+
+def write_events(path, events, binary=False):
+    """把事件写成文本或二进制轨迹文件，返回写入的事件数"""
+    count = 0
+    if binary:
+        with open(path, "wb", buffering=1024 * 1024) as f:
+            f.write(BINARY_MAGIC)
+            for timestamp, op, event_id, size in events:
+                f.write(RECORD.pack(timestamp, op.encode('ascii'), event_id, size))
+                count += 1
+    else:
+        with open(path, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+            for timestamp, op, event_id, size in events:
+                if op == 'a':
+                    f.write(f"{timestamp} a {event_id} {size}\n")
+                else:
+                    f.write(f"{timestamp} f {event_id}\n")
+                count += 1
+    return count
+
+
+# ltrace：可选的 [pid N] 前缀、-tt 时间戳和 -e 输出的 "库->" 前缀，后接 malloc(32) = 0x... /
+# calloc(4, 8) = 0x... / realloc(0x..., 64) = 0x... / free(0x...)；空指针可能写作 0、nil 或 (nil)
+_LTRACE = re.compile(
+    r"^(?:\[pid\s+\d+\]\s+)?(?:(?P<ts>\d+:\d+:\d+(?:\.\d+)?|\d+\.\d+)\s+)?(?:\S+->)?"
+    r"(?P<func>malloc|calloc|realloc|free)\((?P<args>(?:\(nil\)|[^()])*)\)\s*"
+    r"(?:=\s*(?P<ret>0x[0-9a-fA-F]+|0|nil|\(nil\)|NULL))?")
+# glibc mtrace：@ 调用点 + 地址 大小 / @ 调用点 - 地址；realloc 记为 "< 旧地址" 紧跟 "> 新地址 大小"
+_MTRACE = re.compile(r"^@ .*?\s(?P<op>[-+<>])\s+(?P<addr>0x[0-9a-fA-F]+)(?:\s+(?P<size>0x[0-9a-fA-F]+))?")
+# mtrace 的起止标记行，不算作无法解析
+_MTRACE_MARKERS = ("= Start", "= End")
+
+_NULL_POINTERS = ('0', 'nil', '(nil)', 'NULL')
+
+
+def _pointer(text):
+    """解析 ltrace 打印的指针，空指针返回 0"""
+    if text is None or text in _NULL_POINTERS:
+        return 0
+    return int(text, 16)
+
+
+def _parse_timestamp(text, fallback):
+    if text is None:
+        return float(fallback)
+    if ':' in text:
+        h, m, s = text.split(':')
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    return float(text)
+
+
+def convert_malloc_trace(path, stats=None):
+    """把 ltrace / mtrace 输出转换为事件流；地址被复用时分配新的 id。
+    传入 stats 字典时，会在其中累计被跳过的行和调用的数量"""
+    stats = stats if stats is not None else {}
+    for name in ('unparsed_lines', 'failed_allocs', 'null_frees', 'unknown_frees'):
+        stats.setdefault(name, 0)
+    live = {}  # 地址 -> id
+    next_id = 0
+
+    def alloc(ts, addr, size):
+        nonlocal next_id
+        if not addr:
+            stats['failed_allocs'] += 1
+            return None
+        event_id = next_id
+        next_id += 1
+        live[addr] = event_id
+        return ts, 'a', event_id, size
+
+    def free(ts, addr):
+        if not addr:
+            stats['null_frees'] += 1
+            return None
+        event_id = live.pop(addr, None)
+        if event_id is None:
+            stats['unknown_frees'] += 1  # 轨迹开始前分配的内存，或重复释放
+            return None
+        return ts, 'f', event_id, 0
+
+    with open(path, "r", encoding="utf-8", errors="replace", buffering=1024 * 1024) as f:
+        for line_no, line in enumerate(f):
+            m = _MTRACE.match(line)
+            if m:
+                addr = int(m.group('addr'), 16)
+                if m.group('op') in '+>':
+                    event = alloc(float(line_no), addr, int(m.group('size') or '0', 16))
+                else:
+                    event = free(float(line_no), addr)
+                if event:
+                    yield event
+                continue
+
+            m = _LTRACE.match(line)
+            if not m:
+                if line.strip() and not line.startswith(_MTRACE_MARKERS):
+                    stats['unparsed_lines'] += 1
+                continue
+            ts = _parse_timestamp(m.group('ts'), line_no)
+            func = m.group('func')
+            args = [a.strip() for a in m.group('args').split(',') if a.strip()]
+            ret = _pointer(m.group('ret'))
+            try:
+                if func == 'malloc':
+                    event = alloc(ts, ret, int(args[0], 0))
+                elif func == 'calloc':
+                    event = alloc(ts, ret, int(args[0], 0) * int(args[1], 0))
+                elif func == 'free':
+                    event = free(ts, _pointer(args[0]) if args else 0)
+                else:  # realloc = free(旧地址) + malloc(新大小)；realloc(NULL, n) 等同于 malloc
+                    old = _pointer(args[0])
+                    new_size = int(args[1], 0)
+                    if ret == 0 and new_size != 0:
+                        stats['failed_allocs'] += 1
+                        continue  # realloc 失败，旧块保持不变
+                    if old:
+                        event = free(ts, old)
+                        if event:
+                            yield event
+                    event = alloc(ts, ret, new_size) if new_size else None
+            except (IndexError, ValueError):
+                stats['unparsed_lines'] += 1
+                continue
+            if event:
+                yield event
+
+
+def fragmentation(blocks):
+    """外部碎片率：1 - 最大空闲块 / 空闲总量"""
+    free_sizes = [b.size for b in blocks if b.status == 'free']
+    total_free = sum(free_sizes)
+    if not total_free:
+        return 0.0
+    return 1 - max(free_sizes) / total_free
+
+
+def replay(events, strategy, capacity, unit=1, enable_merge=True, enable_compact=False, sample_every=1000):
+    """回放事件流，返回统计结果。大小按 unit 向上取整为分配单位。
+    默认不紧凑：真实分配器不能搬动存活的分配"""
+    manager = MemoryManager(total_size=capacity, enable_merge=enable_merge,
+                            enable_compact=enable_compact, verbose=False,
+                            blocks=[MemoryBlock(0, capacity)])
+    allocate = manager.allocate
+    recycle = manager.recycle
+    clock = time.perf_counter_ns
+    alloc_ns = []
+    free_ns = 0
+    frees = 0
+    failures = 0
+    frag_sum = 0.0
+    frag_samples = 0
+    peak_used = used = 0
+    sizes = {}  # 存活分配 id -> 占用单位数
+
+    start = clock()
+    for i, (_, op, event_id, size) in enumerate(events):
+        if op == 'a':
+            units = -(-size // unit) or 1
+            t0 = clock()
+            addr = allocate(units, strategy, event_id)
+            alloc_ns.append(clock() - t0)
+            if addr is None:
+                failures += 1
+            else:
+                sizes[event_id] = units
+                used += units
+                peak_used = max(peak_used, used)
+        elif event_id in sizes:
+            used -= sizes.pop(event_id)
+            t0 = clock()
+            recycle(event_id)
+            free_ns += clock() - t0
+            frees += 1
+        if i % sample_every == 0:
+            frag_sum += fragmentation(manager.blocks)
+            frag_samples += 1
+    elapsed = (clock() - start) / 1e9
+
+    events_total = len(alloc_ns) + frees
+    alloc_ns.sort()
+    return {
+        'strategy': strategy,
+        'compact': enable_compact,
+        'events': events_total,
+        'events_per_sec': events_total / elapsed if elapsed else 0,
+        'alloc_failures': failures,
+        'mean_alloc_ns': sum(alloc_ns) / len(alloc_ns) if alloc_ns else 0,
+        'p99_alloc_ns': alloc_ns[int(len(alloc_ns) * 0.99)] if alloc_ns else 0,
+        'mean_free_ns': free_ns / frees if frees else 0,
+        'mean_fragmentation': frag_sum / frag_samples if frag_samples else 0,
+        'final_fragmentation': fragmentation(manager.blocks),
+        'peak_used': peak_used,
+    }
+
+
+def compare_strategies(path, strategies=STRATEGIES, **kwargs):
+    """对每种策略重新流式读取轨迹并回放，返回结果列表和推荐策略"""
+    results = [replay(read_events(path), strategy, **kwargs) for strategy in strategies]
+    best = min(results, key=lambda r: (r['alloc_failures'], r['mean_fragmentation'], r['mean_alloc_ns']))
+    return results, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分配轨迹回放")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_replay = sub.add_parser("replay", help="回放轨迹并比较分配策略")
+    p_replay.add_argument("trace")
+    p_replay.add_argument("--capacity", type=int, default=400 * 1024 * 1024, help="地址空间大小（单位数）")
+    p_replay.add_argument("--unit", type=int, default=1, help="每个分配单位的字节数")
+    p_replay.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    p_replay.add_argument("--no-merge", action="store_true", help="禁用内存合并")
+    p_replay.add_argument("--compact", action="store_true",
+                          help="分配失败时紧凑（真实 malloc 做不到，仅用于对照）")
+    p_replay.add_argument("--sample-every", type=int, default=1000, help="每多少个事件采样一次碎片率")
+
+    p_convert = sub.add_parser("convert", help="把 ltrace/mtrace 输出转换为轨迹文件")
+    p_convert.add_argument("source")
+    p_convert.add_argument("output")
+    p_convert.add_argument("--binary", action="store_true", help="输出二进制格式")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        stats = {}
+        count = write_events(args.output, convert_malloc_trace(args.source, stats), binary=args.binary)
+        print(f"✅ 已转换 {count} 个事件 -> {args.output}")
+        print(f"ℹ️ 跳过: 无法解析的行 {stats['unparsed_lines']}，分配失败 {stats['failed_allocs']}，"
+              f"free(NULL) {stats['null_frees']}，未知地址的释放 {stats['unknown_frees']}")
+        return
+
+    results, best = compare_strategies(
+        args.trace, args.strategies, capacity=args.capacity, unit=args.unit,
+        enable_merge=not args.no_merge, enable_compact=args.compact,
+        sample_every=args.sample_every)
+    if args.compact:
+        print("⚠️ 已启用紧凑：存活分配会被搬动，分配失败次数不代表真实分配器的表现")
+    else:
+        print("ℹ️ 未启用紧凑（与真实 malloc 一致），可用 --compact 对照")
+    print(f"{'策略':<10} {'事件/秒':>12} {'失败':>8} {'平均分配ns':>12} {'p99分配ns':>12} "
+          f"{'平均释放ns':>12} {'平均碎片率':>10} {'最终碎片率':>10}")
+    for r in results:
+        print(f"{r['strategy']:<10} {r['events_per_sec']:>12.0f} {r['alloc_failures']:>8} "
+              f"{r['mean_alloc_ns']:>12.0f} {r['p99_alloc_ns']:>12.0f} {r['mean_free_ns']:>12.0f} "
+              f"{r['mean_fragmentation']:>10.3f} {r['final_fragmentation']:>10.3f}")
+    print(f"🏆 推荐策略: {best['strategy']}（分配失败最少，其次碎片率最低，再次分配延迟最低）")
+
+
+if __name__ == "__main__":
+    sys.exit(main())